@@ -0,0 +1,63 @@
+import MeritOrder
+import Scoring
+from HistoryIO import is_round_log, iter_rounds, read_history
+
+from multiprocessing import Pool
+from typing import Iterable, Iterator
+import os
+
+HISTORY_SUFFIXES = (".json", ".jsonl", ".npz")
+
+def get_constants() -> dict:
+	'''Snapshot of the scoring constants, the workers are set up with it so they score like this process does.'''
+
+	return {
+		"Scoring": {
+			"prices": dict(Scoring.prices),
+			"co2eq": dict(Scoring.co2eq),
+			"BALANCE_CUTOFF_PERCENT": Scoring.BALANCE_CUTOFF_PERCENT,
+			"MAX_POPULARITY_MW": Scoring.MAX_POPULARITY_MW,
+		},
+		"MeritOrder": {
+			"co2eq": dict(MeritOrder.co2eq),
+			"derating": dict(MeritOrder.derating),
+			"CO2EQ": MeritOrder.CO2EQ.copy(),
+			"DERATING": MeritOrder.DERATING.copy(),
+		},
+	}
+
+def _init_worker(constants):
+	for name, value in constants["Scoring"].items():
+		setattr(Scoring, name, value)
+
+	for name, value in constants["MeritOrder"].items():
+		setattr(MeritOrder, name, value)
+
+def _score(history):
+	if isinstance(history, (str, os.PathLike)) and is_round_log(history):
+		return Scoring.score_rounds(iter_rounds(history))
+
+	if isinstance(history, (str, os.PathLike)):
+		history = read_history(history)
+
+	return Scoring.calculate_final_scores(history)
+
+def get_history_files(directory) -> list:
+	'''Get the serialized game histories (*.json, *.jsonl round logs and *.npz columnar stores) in a directory, sorted by name.'''
+
+	return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(HISTORY_SUFFIXES))
+
+def score_games(histories: Iterable, processes: int = None, chunksize: int = 4) -> Iterator[dict]:
+	'''Score many games on a process pool with calculate_final_scores, yielding the results in the order of the input.
+
+	The histories can be lists of round dicts, GameHistory objects or paths of files written by HistoryIO.dump_history, HistoryIO.write_rounds or HistoryIO.dump_columnar. Paths are read by the workers, so only the scores travel between processes.'''
+
+	with Pool(processes, initializer = _init_worker, initargs = (get_constants(),)) as pool:
+		yield from pool.imap(_score, histories, chunksize)
+
+def score_directory(directory, processes: int = None, chunksize: int = 4) -> Iterator[tuple]:
+	'''Score every serialized game history in a directory, yielding (path, scores) in the order of the file names.'''
+
+	paths = get_history_files(directory)
+
+	yield from zip(paths, score_games(paths, processes, chunksize))
@@ -0,0 +1,215 @@
+from MeritOrder import PADDING, as_productions
+
+from typing import List
+import numpy as np
+
+#one record per powerplant in a round of a team
+HISTORY_DTYPE = np.dtype([("round", np.int32), ("team", np.int32), ("power", np.int8), ("volume", np.float64)])
+
+def _grow(array, size):
+	'''Get the array with room for at least size rows, the capacity is doubled so appending stays amortized O(1).'''
+
+	if size <= len(array):
+		return array
+
+	grown = np.zeros((max(size, 2 * len(array)),) + array.shape[1:], dtype = array.dtype)
+	grown[:len(array)] = array
+
+	return grown
+
+class TeamStats(dict):
+	'''Per-team view of a GameHistory. The entries are views into its arrays, "productions" is only built when it is asked for.'''
+
+	def __init__(self, history, team):
+		super().__init__()
+
+		self.history = history
+		self.team = team
+
+		idx = history.get_team_index(team)
+
+		self["consumptions"] = history.consumptions[:, idx]
+		self["production_sums"] = history.get_production_sums()[:, idx]
+
+	def __missing__(self, key):
+		if key != "productions":
+			raise KeyError(key)
+
+		self[key] = [self.history.get_productions(r, self.team) for r in range(len(self.history))]
+
+		return self[key]
+
+class GameHistory:
+	'''Columnar store of a game: one record per powerplant and round in contiguous arrays, and the consumptions in a rounds x teams matrix.'''
+
+	def __init__(self, teams: List[str]):
+		self.teams = list(teams)
+		self._team_index = {t: idx for idx, t in enumerate(self.teams)}
+
+		self._records = np.zeros(64, dtype = HISTORY_DTYPE)
+		self._num_records = 0
+
+		self._consumptions = np.zeros((8, len(self.teams)))
+		self._num_rounds = 0
+
+		#records of round r and team t are _records[_starts[g]:_starts[g + 1]] with g = r * teams + t
+		self._starts = np.zeros(8 * len(self.teams) + 1, dtype = np.intp)
+
+		self._production_sums = None
+		self._team_stats = dict()
+
+	@classmethod
+	def from_rounds(cls, history):
+		'''Build the store from the list of round dicts used by Scoring.'''
+
+		game = cls(history[0].keys())
+
+		for r in history:
+			game.append_round(r)
+
+		return game
+
+	@classmethod
+	def load(cls, path):
+		'''Read a store written by save.'''
+
+		with np.load(path) as data:
+			game = cls(data["teams"].tolist())
+
+			game._records = data["records"]
+			game._num_records = len(game._records)
+
+			game._consumptions = data["consumptions"]
+			game._num_rounds = len(game._consumptions)
+
+			game._starts = data["starts"]
+
+		return game
+
+	def save(self, path):
+		'''Write the store to a NumPy .npz file, its arrays are written as they are so loading it needs no parsing.'''
+
+		np.savez(path, teams = np.array(self.teams, dtype = str), records = self.records, consumptions = self.consumptions, starts = self._starts[:self._num_rounds * len(self.teams) + 1])
+
+	def __len__(self):
+		return self._num_rounds
+
+	def __getitem__(self, team) -> TeamStats:
+		if team not in self._team_stats:
+			self._team_stats[team] = TeamStats(self, team)
+
+		return self._team_stats[team]
+
+	def get_team_index(self, team) -> int:
+		return self._team_index[team]
+
+	def append_round(self, round_dict):
+		'''Append a round given as {team: {"productions": ..., "total_consumption": ...}}, in O(plants) of the round.'''
+
+		productions = [as_productions(round_dict[t]["productions"]) for t in self.teams]
+		lengths = [len(p) for p in productions]
+
+		start = self._num_records
+		end = start + sum(lengths)
+
+		self._records = _grow(self._records, end)
+
+		records = self._records[start:end]
+		records["round"] = self._num_rounds
+		records["team"] = np.repeat(np.arange(len(self.teams)), lengths)
+
+		if end > start:
+			records["power"] = np.concatenate([p["power"] for p in productions])
+			records["volume"] = np.concatenate([p["volume"] for p in productions])
+
+		self._consumptions = _grow(self._consumptions, self._num_rounds + 1)
+		self._consumptions[self._num_rounds] = [round_dict[t]["total_consumption"] for t in self.teams]
+
+		first = self._num_rounds * len(self.teams)
+
+		self._starts = _grow(self._starts, first + len(self.teams) + 1)
+		self._starts[first + 1:first + len(self.teams) + 1] = start + np.cumsum(lengths)
+
+		self._num_records = end
+		self._num_rounds += 1
+
+		#views handed out before may point into a reallocated buffer
+		self._production_sums = None
+		self._team_stats = dict()
+
+	@property
+	def records(self) -> np.ndarray:
+		return self._records[:self._num_records]
+
+	@property
+	def consumptions(self) -> np.ndarray:
+		'''Consumption of every team in every round, rounds x teams.'''
+
+		return self._consumptions[:self._num_rounds]
+
+	def get_productions(self, round_idx, team) -> np.ndarray:
+		'''Get the powerplants of a team in a round as a view with "power" and "volume" fields.'''
+
+		group = round_idx * len(self.teams) + self._team_index[team]
+
+		return self.records[self._starts[group]:self._starts[group + 1]]
+
+	def get_production_sums(self) -> np.ndarray:
+		'''Total production of every team in every round, rounds x teams.'''
+
+		if self._production_sums is None:
+			records = self.records
+			groups = records["round"].astype(np.intp) * len(self.teams) + records["team"]
+
+			sums = np.bincount(groups, weights = records["volume"], minlength = self._num_rounds * len(self.teams))
+
+			self._production_sums = sums.reshape(self._num_rounds, len(self.teams))
+
+		return self._production_sums
+
+	def get_padded(self):
+		'''Get the technology codes and volumes as padded rounds x teams x plants arrays for MeritOrder.clear_batch.'''
+
+		records = self.records
+		groups = records["round"].astype(np.intp) * len(self.teams) + records["team"]
+
+		starts = self._starts[:self._num_rounds * len(self.teams) + 1]
+		lengths = np.diff(starts)
+		width = int(lengths.max()) if len(lengths) else 0
+
+		shape = (self._num_rounds, len(self.teams), width)
+
+		codes = np.full(shape, PADDING, dtype = np.intp)
+		volumes = np.zeros(shape)
+
+		if len(records):
+			cols = np.arange(len(records)) - starts[groups]
+
+			codes.reshape(-1, width)[groups, cols] = records["power"]
+			volumes.reshape(-1, width)[groups, cols] = records["volume"]
+
+		return codes, volumes
+
+	def get_round_padded(self):
+		'''Get the powerplants of all teams of every round as padded rounds x plants arrays of technology codes, volumes and team indices, e.g. for one market shared by the teams.'''
+
+		records = self.records
+		rounds = records["round"].astype(np.intp)
+
+		starts = self._starts[:self._num_rounds * len(self.teams) + 1:len(self.teams)]
+		width = int(np.diff(starts).max()) if self._num_rounds else 0
+
+		shape = (self._num_rounds, width)
+
+		codes = np.full(shape, PADDING, dtype = np.intp)
+		volumes = np.zeros(shape)
+		teams = np.full(shape, PADDING, dtype = np.intp)
+
+		if len(records):
+			cols = np.arange(len(records)) - starts[rounds]
+
+			codes[rounds, cols] = records["power"]
+			volumes[rounds, cols] = records["volume"]
+			teams[rounds, cols] = records["team"]
+
+		return codes, volumes, teams
@@ -0,0 +1,88 @@
+from GameHistory import GameHistory
+from MeritOrder import Power, as_productions
+
+import json
+
+def encode_round(round_dict, codes: bool = False) -> dict:
+	'''Convert a round dict to plain JSON types, technologies are written by name or, with codes = True, as integer codes.'''
+
+	encoded = dict()
+
+	for team, stats in round_dict.items():
+		productions = as_productions(stats["productions"])
+
+		encoded[team] = {
+			"productions": [[int(p) if codes else Power(int(p)).name, float(v)] for p, v in zip(productions["power"], productions["volume"])],
+			"total_consumption": float(stats["total_consumption"]),
+		}
+
+	return encoded
+
+def decode_round(round_dict) -> dict:
+	'''Convert a round read from JSON into a round dict for Scoring, the technologies can be names or integer codes.'''
+
+	return {
+		team: {
+			"productions": as_productions(stats["productions"]),
+			"total_consumption": stats["total_consumption"],
+		}
+		for team, stats in round_dict.items()
+	}
+
+def dump_history(history, path):
+	'''Write a game history (list of round dicts) to a JSON file.'''
+
+	with open(path, "w") as f:
+		json.dump([encode_round(r) for r in history], f)
+
+def load_history(path):
+	'''Read a game history written by dump_history.'''
+
+	with open(path, "r") as f:
+		return [decode_round(r) for r in json.load(f)]
+
+def write_rounds(rounds, path, codes: bool = False):
+	'''Write rounds as JSON Lines, one round per line. The rounds can come from a generator, they are written as they arrive.'''
+
+	with open(path, "w") as f:
+		for r in rounds:
+			f.write(json.dumps(encode_round(r, codes)) + "\n")
+
+def append_round(round_dict, path, codes: bool = False):
+	'''Append a closed round to a JSON Lines round log.'''
+
+	with open(path, "a") as f:
+		f.write(json.dumps(encode_round(round_dict, codes)) + "\n")
+
+def iter_rounds(path):
+	'''Read a JSON Lines round log lazily, one decoded round at a time.'''
+
+	with open(path, "r") as f:
+		for line in f:
+			if line.strip():
+				yield decode_round(json.loads(line))
+
+def is_round_log(path) -> bool:
+	return str(path).endswith(".jsonl")
+
+def is_columnar(path) -> bool:
+	return str(path).endswith(".npz")
+
+def dump_columnar(history, path):
+	'''Write a game history (list of round dicts or GameHistory) in the binary columnar format of GameHistory.save.'''
+
+	if not isinstance(history, GameHistory):
+		history = GameHistory.from_rounds(history)
+
+	history.save(path)
+
+def read_history(path):
+	'''Read a game history from any of the formats by the file suffix: a GameHistory from .npz, the lazy rounds of a .jsonl round log, or the list of rounds of a JSON file.'''
+
+	if is_columnar(path):
+		return GameHistory.load(path)
+
+	if is_round_log(path):
+		return iter_rounds(path)
+
+	return load_history(path)
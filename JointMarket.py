@@ -0,0 +1,83 @@
+import MeritOrder
+import Scoring
+from MeritOrder import PADDING, clear_batch, get_table
+from Scoring import building_popularity, combine_scores, ecology_score, finances_score, get_round_balance, get_team_stats, get_teams
+
+import numpy as np
+
+class JointDispatch:
+	'''Result of clearing one market shared by all teams in every round.
+
+	price and marginal are per round. The other attributes are rounds x teams: the volume dispatched from a team's powerplants, their revenue at the clearing price, operating expenses, profit and CO2, and the round balance of the team's consumption against its dispatched volume.'''
+
+	def __init__(self, teams, price, marginal, dispatched, revenue, expenses, co2, balance):
+		self.teams = teams
+		self.price = price
+		self.marginal = marginal
+		self.dispatched = dispatched
+		self.revenue = revenue
+		self.expenses = expenses
+		self.profit = revenue - expenses
+		self.co2 = co2
+		self.balance = balance
+
+def clear_joint(history, prices = None) -> JointDispatch:
+	'''Merge the powerplants of all teams into one merit order per round and clear it against the total consumption of the round.
+
+	Every round is sorted once, O(plants log plants) over the plants of all teams, and all rounds are cleared in one batch. The dispatch is attributed back to the teams with a bincount over (round, team).'''
+
+	game = get_team_stats(history)
+	teams = get_teams(game)
+	num_rounds = len(game)
+
+	price_table = get_table(Scoring.prices if prices is None else prices)
+
+	codes, volumes, owners = game.get_round_padded()
+	consumptions = game.consumptions
+
+	#put the rounds in merit order here, so the owners can be sorted along, clear_batch keeps an order that is already sorted
+	padding = codes == PADDING
+	order = np.argsort(np.where(padding, np.inf, price_table[np.where(padding, 0, codes)]), axis = -1, kind = "stable")
+
+	codes = np.take_along_axis(codes, order, axis = -1)
+	volumes = np.take_along_axis(volumes, order, axis = -1)
+	owners = np.take_along_axis(owners, order, axis = -1)
+
+	dispatch = clear_batch(price_table, codes, volumes, consumptions.sum(axis = 1))
+
+	plants = owners != PADDING
+	groups = (np.arange(num_rounds)[:, np.newaxis] * len(teams) + owners)[plants]
+	technologies = np.where(codes == PADDING, 0, codes)[plants]
+	dispatched = dispatch.dispatched[plants]
+
+	def per_team(weights):
+		return np.bincount(groups, weights = weights, minlength = num_rounds * len(teams)).reshape(num_rounds, len(teams))
+
+	team_dispatched = per_team(dispatched)
+
+	return JointDispatch(
+		teams,
+		dispatch.price,
+		dispatch.marginal,
+		team_dispatched,
+		team_dispatched * dispatch.price[:, np.newaxis],
+		per_team(dispatched * price_table[technologies]),
+		per_team(dispatched * MeritOrder.CO2EQ[technologies]),
+		get_round_balance(consumptions - team_dispatched, Scoring.BALANCE_CUTOFF_PERCENT * 0.01 * consumptions),
+	)
+
+def calculate_joint_scores(history, prices = None) -> dict:
+	'''Score a game played on one shared market, in the format of calculate_final_scores. The ecology and finances come from the teams' share of the joint dispatch and the balance from their dispatched volume.'''
+
+	game = get_team_stats(history)
+	dispatch = clear_joint(game, prices)
+
+	total_cons = game.consumptions.sum(axis = 0)
+
+	emx = dispatch.balance.mean(axis = 0) * 100
+	fin = finances_score(dispatch.expenses.sum(axis = 0), total_cons, prices)
+	eco = ecology_score(dispatch.co2.sum(axis = 0), total_cons)
+
+	scores = combine_scores(emx, fin, eco, building_popularity(total_cons))
+
+	return {t: {k: v[idx] for k, v in scores.items()} for idx, t in enumerate(dispatch.teams)}
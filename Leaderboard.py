@@ -0,0 +1,79 @@
+from Scoring import FACTORS
+
+from bisect import bisect_left, insort
+from typing import List, Tuple
+
+RESOLUTION = 100 #buckets per score point, the scores are rounded to 2 decimals
+
+MAX_SCORE = 100
+
+class Leaderboard:
+	'''Ranks of the teams in every factor, kept up to date as their scores change.
+
+	Every factor keeps its (-score bucket, team) pairs in a sorted list, best first and tied teams by name. Asking for a rank or a percentile is a binary search, O(log teams), and top k reads the head of the list. An update moves a team within the lists, which is cheap for the tens of teams of a game, and a session without teams takes no memory.'''
+
+	def __init__(self, factors = FACTORS):
+		self.factors = tuple(factors)
+
+		self._ranking = {f: [] for f in self.factors}
+		self._teams = dict() #team -> {factor: bucket}
+
+	def __len__(self):
+		return len(self._teams)
+
+	def __contains__(self, team):
+		return team in self._teams
+
+	@staticmethod
+	def _get_bucket(score) -> int:
+		return int(round(min(max(float(score), 0.0), MAX_SCORE) * RESOLUTION))
+
+	def _remove(self, team):
+		for factor, bucket in self._teams.pop(team).items():
+			ranking = self._ranking[factor]
+			del ranking[bisect_left(ranking, (-bucket, team))]
+
+	def update(self, team, scores: dict):
+		'''Set the scores of a team, a score dict as returned by calculate_final_scores.'''
+
+		if team in self._teams:
+			self._remove(team)
+
+		buckets = {f: self._get_bucket(scores[f]) for f in self.factors}
+
+		for factor, bucket in buckets.items():
+			insort(self._ranking[factor], (-bucket, team))
+
+		self._teams[team] = buckets
+
+	def update_all(self, scores: dict):
+		'''Set the scores of many teams, {team: scores} like calculate_final_scores returns.'''
+
+		for team, s in scores.items():
+			self.update(team, s)
+
+	def remove(self, team):
+		if team in self._teams:
+			self._remove(team)
+
+	def get_score(self, team, factor) -> float:
+		return self._teams[team][factor] / RESOLUTION
+
+	def _count_better(self, team, factor) -> int:
+		#(-bucket,) sorts before every team with that bucket
+		return bisect_left(self._ranking[factor], (-self._teams[team][factor],))
+
+	def get_rank(self, team, factor) -> int:
+		'''Rank of a team in a factor, 1 is the best and tied teams share a rank.'''
+
+		return self._count_better(team, factor) + 1
+
+	def get_percentile(self, team, factor) -> float:
+		'''Share of the teams scoring at most the team's score in a factor, in percent.'''
+
+		return 100 * (len(self._teams) - self._count_better(team, factor)) / len(self._teams)
+
+	def get_top(self, factor, k: int = 10) -> List[Tuple[str, float]]:
+		'''The k best teams in a factor with their scores, best first. Tied teams are ordered by name.'''
+
+		return [(team, -bucket / RESOLUTION) for bucket, team in self._ranking[factor][:k]]
@@ -1,172 +1,462 @@
+from collections import OrderedDict
 from enum import Enum
+import threading
+from Profiling import profiled
 
 from typing import List, Tuple
 import numpy as np
 
 class Power(Enum):
-	COAL = 0,
-	GAS = 1,
-	NUCLEAR = 2,
-	WATER = 3,
-	WATER_STORAGE = 4,
-	WIND = 5,
-	PHOTOVOLTAIC = 6,
+	COAL = 0
+	GAS = 1
+	NUCLEAR = 2
+	WATER = 3
+	WATER_STORAGE = 4
+	WIND = 5
+	PHOTOVOLTAIC = 6
 	BATTERY = 7
 
-class MeritOrder:
-	def __init__(self, prices: dict[Power, float], productions: List[Tuple[Power, float]], total_consumption: float):
-		self.prices = prices
-		self.productions = np.array(productions)
-		self.total_consumption = total_consumption
-		self.sorted_productions = np.array(sorted(self.productions, key = lambda x: self.prices[x[0]]))
-		self.co2eq = {
-			Power.COAL: 1,
-			Power.GAS: 0.5,
-			Power.NUCLEAR: 0,
-			Power.WATER: 0,
-			Power.WATER_STORAGE: 0,
-			Power.WIND: 0,
-			Power.PHOTOVOLTAIC: 0,
-			Power.BATTERY: 0,
-		}
-
-		self.derating = {
-			Power.COAL: 87.9,
-			Power.GAS: 95,
-			Power.NUCLEAR: 92.1,
-			Power.WATER: 41,
-			Power.WATER_STORAGE: 41,
-			Power.WIND: 7.3,
-			Power.PHOTOVOLTAIC: 2.7,
-			Power.BATTERY: 0.0,
-		}
+co2eq = {
+	Power.COAL: 1,
+	Power.GAS: 0.5,
+	Power.NUCLEAR: 0,
+	Power.WATER: 0,
+	Power.WATER_STORAGE: 0,
+	Power.WIND: 0,
+	Power.PHOTOVOLTAIC: 0,
+	Power.BATTERY: 0,
+}
 
-	def getPrice(self):
-		'''Get the current price of power in EUR/MWh, by ordering the powerplant according to the merit order, and getting the lowest price that satisfies the total consumption.'''
-	
-		cmsm = np.cumsum(self.sorted_productions[:, 1])
+derating = {
+	Power.COAL: 87.9,
+	Power.GAS: 95,
+	Power.NUCLEAR: 92.1,
+	Power.WATER: 41,
+	Power.WATER_STORAGE: 41,
+	Power.WIND: 7.3,
+	Power.PHOTOVOLTAIC: 2.7,
+	Power.BATTERY: 0.0,
+}
 
-		for idx, el in enumerate(cmsm):
-			if el >= self.total_consumption:
-				return self.prices[self.sorted_productions[idx][0]]
+POWER_CODES = {p.name: p.value for p in Power}
 
-		return 0
+#a production is a technology code (Power.value) and a volume in MW
+PRODUCTION_DTYPE = np.dtype([("power", np.int8), ("volume", np.float64)])
 
-	def getTotalCost(self):
-		'''Get the total cost of electricity production with the current consumption total.'''
-		price_per_mwh = self.getPrice()
+PADDING = -1 #technology code of an empty slot in a padded batch
 
-		return price_per_mwh * self.total_consumption
+def get_table(values) -> np.ndarray:
+	'''Convert a per-technology dict into a lookup table indexed by the technology code, tables are returned as they are.'''
 
-	def getTotalProfit(self):
-		'''Get total profit in EUR for all the powerplants, that produce, with a given consumption.'''
+	if isinstance(values, dict):
+		return np.array([values[p] for p in Power], dtype = float)
 
-		price = self.getPrice()
+	return np.asarray(values, dtype = float)
 
-		cmsm = np.cumsum(self.sorted_productions[:, 1])
+CO2EQ = get_table(co2eq)
+DERATING = get_table(derating)
 
-		total = 0
+def get_power_code(power) -> int:
+	'''Get the technology code of a Power, its name (e.g. "COAL") or its code.'''
 
-		for idx, el in enumerate(cmsm):
-			if el >= self.total_consumption:
-				pp_type, _ = self.sorted_productions[idx]
-				pp_price = self.prices[pp_type]
+	if isinstance(power, Power):
+		return power.value
 
-				production = self.total_consumption - cmsm[idx - 1] #the previous cumsum element
+	if isinstance(power, str):
+		return POWER_CODES[power]
 
-				pp_selling_cost = production * price
-				pp_operating_cost = production * pp_price
+	return Power(int(power)).value
 
-				total += pp_selling_cost - pp_operating_cost #profit for powerplant
+def as_productions(productions) -> np.ndarray:
+	'''Get productions as an array with "power" and "volume" fields, a list of (technology, float) tuples is converted, arrays are used as they are.'''
 
-				break
+	if isinstance(productions, np.ndarray) and productions.dtype.names:
+		return productions
 
-			else:
-				pp_type, pp_power = self.sorted_productions[idx]
-				pp_price = self.prices[pp_type]
+	return np.array([(get_power_code(p), v) for p, v in productions], dtype = PRODUCTION_DTYPE)
 
-				pp_selling_cost = pp_power * price
-				pp_operating_cost = pp_power * pp_price
+def pack_productions(productions):
+	'''Pack a sequence of productions into padded (len(productions) x plants) arrays of technology codes and volumes.'''
 
-				total += pp_selling_cost - pp_operating_cost #profit for powerplant
+	productions = [as_productions(p) for p in productions]
 
-		return total
-	
-	def getTotalExpenses(self):
-		cmsm = np.cumsum(self.sorted_productions[:, 1])
+	lengths = np.array([len(p) for p in productions], dtype = np.intp)
+	width = int(lengths.max()) if len(lengths) else 0
 
-		total = 0
+	codes = np.full((len(productions), width), PADDING, dtype = np.intp)
+	volumes = np.zeros((len(productions), width))
 
-		for idx, el in enumerate(cmsm):
-			if el >= self.total_consumption:
-				pp_type, _ = self.sorted_productions[idx]
+	if lengths.sum():
+		rows = np.repeat(np.arange(len(productions)), lengths)
+		cols = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
 
-				production = self.total_consumption - cmsm[idx - 1] #the previous cumsum element
+		codes[rows, cols] = np.concatenate([p["power"] for p in productions])
+		volumes[rows, cols] = np.concatenate([p["volume"] for p in productions])
 
-				total += production * self.prices[pp_type]
+	return codes, volumes
 
-				break
+class BatchDispatch:
+	'''Result of clearing many merit orders at once, every attribute is an array with the leading shape of the batch.'''
 
-			else:
-				pp_type, pp_power = self.sorted_productions[idx]
+	def __init__(self, marginal, codes, dispatched, price, expenses, co2, stability):
+		self.marginal = marginal
+		self.codes = codes #technology codes in merit order, aligned with dispatched
+		self.dispatched = dispatched
+		self.price = price
+		self.expenses = expenses
+		self.co2 = co2
+		self.stability = stability
 
-				total += pp_power * self.prices[pp_type]
+	def __getitem__(self, key):
+		return BatchDispatch(self.marginal[key], self.codes[key], self.dispatched[key], self.price[key], self.expenses[key], self.co2[key], self.stability[key])
 
-		return total
-	
-	def getReleasedCO2(self):
-		'''Get the amount of released CO2 eq. (in tonnes).'''
+	def get_mix(self) -> np.ndarray:
+		'''Dispatched volume per technology, the last axis is indexed by the Power code.'''
+
+		return np.stack([np.sum(np.where(self.codes == p.value, self.dispatched, 0.0), axis = -1) for p in Power], axis = -1)
+
+def _pad_last(array, before, after):
+	return np.pad(array, [(0, 0)] * (array.ndim - 1) + [(before, after)])
+
+def sort_batch(price_table: np.ndarray, codes: np.ndarray, volumes: np.ndarray):
+	'''Put every merit order of a padded batch in merit order, the padding goes last and keeps its PADDING code. Returns the sorted codes, volumes and unit prices (infinite for the padding).
+
+	The price table can be a stack of tables (... x technologies), the batch is then sorted once per table and the leading axes of the stack come first.'''
+
+	codes = np.asarray(codes, dtype = np.intp)
+
+	padding = codes == PADDING
+	volumes = np.where(padding, 0.0, volumes)
+
+	unit_prices = np.where(padding, np.inf, np.take(price_table, np.where(padding, 0, codes), axis = -1))
+	codes = np.broadcast_to(codes, unit_prices.shape)
+	volumes = np.broadcast_to(volumes, unit_prices.shape)
+
+	#stable sort keeps the order of equally priced plants like sorted() does
+	order = np.argsort(unit_prices, axis = -1, kind = "stable")
+
+	return np.take_along_axis(codes, order, axis = -1), np.take_along_axis(volumes, order, axis = -1), np.take_along_axis(unit_prices, order, axis = -1)
+
+@profiled()
+def clear_batch(prices, codes: np.ndarray, volumes: np.ndarray, total_consumption: np.ndarray) -> BatchDispatch:
+	'''Clear a padded (... x plants) batch of merit orders against the matching consumptions in one pass.
+
+	With a stack of price tables (... x technologies) the batch is cleared under every table at once, the leading axes of the stack come first in the result.'''
+
+	price_table = get_table(prices)
+	total_consumption = np.asarray(total_consumption, dtype = float)
+
+	sorted_codes, volumes, unit_prices = sort_batch(price_table, codes, volumes)
+
+	padding = sorted_codes == PADDING
+	codes = np.where(padding, 0, sorted_codes)
+	unit_prices = np.where(padding, 0.0, unit_prices)
+
+	cmsm = np.cumsum(volumes, axis = -1)
+	demand = total_consumption[..., np.newaxis]
+
+	#row-wise searchsorted(cmsm, demand, side = "left"): the supply is nondecreasing, so counting the plants below the demand finds the marginal one
+	marginal = np.count_nonzero(cmsm < demand, axis = -1)
+	marginal = np.where(marginal < np.count_nonzero(~padding, axis = -1), marginal, volumes.shape[-1]) #padding is never the marginal plant
+	at_marginal = marginal[..., np.newaxis]
 
-		cmsm = np.cumsum(self.sorted_productions[:, 1])
+	#marginal == plants when the consumption is not covered, padding the last axis by one makes it read a zero price
+	previous = np.take_along_axis(_pad_last(cmsm, 1, 0), at_marginal, axis = -1)
+	price = np.take_along_axis(_pad_last(unit_prices, 0, 1), at_marginal, axis = -1)[..., 0]
 
-		total = 0
+	position = np.arange(volumes.shape[-1])
+	dispatched = np.where(position < at_marginal, volumes, 0.0)
+	dispatched = np.where(position == at_marginal, demand - previous, dispatched)
 
-		for idx, el in enumerate(cmsm):
-			if el >= self.total_consumption:
-				pp_type, _ = self.sorted_productions[idx]
+	expenses = np.sum(dispatched * unit_prices, axis = -1)
+	co2 = np.sum(dispatched * CO2EQ[codes], axis = -1)
 
-				production = self.total_consumption - cmsm[idx - 1] #the previous cumsum element
+	weighted = np.sum(dispatched * DERATING[codes], axis = -1)
+	stability = np.divide(weighted, total_consumption, out = np.full(weighted.shape, 100.0), where = total_consumption > 0)
 
-				total += production * self.co2eq[pp_type]
+	return BatchDispatch(marginal, sorted_codes, dispatched, price, expenses, co2, stability)
 
-				break
+class DispatchCache:
+	'''Bounded LRU cache of cleared merit orders, in front of MeritOrder.dispatch and clear_batch. A merit order is keyed by its merit-ordered productions, its consumption and the price, CO2 and derating tables, so repeated portfolios are cleared only once.'''
+
+	def __init__(self, maxsize: int = 65536):
+		self.maxsize = maxsize #0 disables the cache
+		self.hits = 0
+		self.misses = 0
+
+		self._entries = OrderedDict()
+		self._lock = threading.Lock() #the cache is shared by scoring threads, e.g. the executor of ScoringService
+
+	def __len__(self):
+		return len(self._entries)
+
+	def reset(self):
+		'''Drop every cached result and zero the counters.'''
+
+		with self._lock:
+			self._entries.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def _get(self, key):
+		with self._lock:
+			entry = self._entries.get(key)
+
+			if entry is None:
+				self.misses += 1
 
 			else:
-				pp_type, pp_power = self.sorted_productions[idx]
+				self.hits += 1
+				self._entries.move_to_end(key)
 
-				total += pp_power * self.co2eq[pp_type]
+			return entry
 
-		return total
-	
-	def getGridStability(self):
-		'''Get the grid stability coefficient.'''
+	def _put(self, key, entry):
+		with self._lock:
+			self._entries[key] = entry
+
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last = False)
+
+	@profiled()
+	def get_dispatch(self, merit_order) -> "Dispatch":
+		'''Get the Dispatch of a MeritOrder, it is only cleared if the same merit order was not seen before.'''
+
+		if self.maxsize <= 0:
+			return Dispatch(merit_order)
+
+		sorted_productions = merit_order.sorted_productions
+
+		key = b"D" + merit_order.price_table.tobytes() + CO2EQ.tobytes() + DERATING.tobytes() \
+			+ sorted_productions["power"].astype(np.int8).tobytes() + sorted_productions["volume"].astype(np.float64).tobytes() \
+			+ np.float64(merit_order.total_consumption).tobytes()
+
+		dispatch = self._get(key)
+
+		if dispatch is not None:
+			return dispatch
+
+		dispatch = Dispatch(merit_order)
+		dispatch.dispatched.setflags(write = False) #shared by every MeritOrder with the same key
+
+		self._put(key, dispatch)
+
+		return dispatch
+
+	def get_keys(self, price_table: np.ndarray, codes: np.ndarray, volumes: np.ndarray, total_consumption: np.ndarray) -> List[bytes]:
+		'''Fingerprints of the rows of a batch that is already in merit order (sort_batch).
+
+		A row is packed as its consumption followed by (code + 1, volume) per plant, so the padding is all zero bytes at the end and stripping it makes the key independent of the batch width. A plant always starts with a nonzero byte, so no two rows share a key.'''
+
+		rows = np.zeros(len(codes), dtype = [("consumption", np.float64), ("plants", [("power", np.uint8), ("volume", np.float64)], codes.shape[-1])])
+		rows["consumption"] = total_consumption
+		rows["plants"]["power"] = codes + 1
+		rows["plants"]["volume"] = volumes
+
+		tables = b"B" + price_table.tobytes() + CO2EQ.tobytes() + DERATING.tobytes()
+
+		return [tables + row.rstrip(b"\0") for row in rows.view(np.dtype((np.void, rows.dtype.itemsize))).tolist()]
+
+	@profiled()
+	def clear(self, prices, codes: np.ndarray, volumes: np.ndarray, total_consumption: np.ndarray) -> BatchDispatch:
+		'''Like clear_batch, but merit orders seen before are served from the cache and only the rest is cleared, in one batch.'''
+
+		codes = np.asarray(codes, dtype = np.intp)
+
+		#without plants there is nothing worth caching, and no row to reshape the batch into
+		if self.maxsize <= 0 or codes.shape[-1] == 0:
+			return clear_batch(prices, codes, volumes, total_consumption)
+
+		price_table = get_table(prices)
+		total_consumption = np.asarray(total_consumption, dtype = float)
+
+		width = codes.shape[-1]
+
+		codes, volumes, _ = sort_batch(price_table, codes.reshape(-1, width), np.broadcast_to(volumes, codes.shape).reshape(-1, width))
+		consumptions = total_consumption.reshape(-1)
+
+		keys = self.get_keys(price_table, codes, volumes, consumptions)
+
+		#every distinct row gets a slot, the rows are gathered from the slots at the end
+		slots = dict()
+		rows = np.empty(len(keys), dtype = np.intp)
+		entries = []
+		missing = []
+		repeats = 0
 
-		if self.total_consumption <= 0:
-			return 100.0
+		for i, key in enumerate(keys):
+			slot = slots.get(key)
 
-		cmsm = np.cumsum(self.sorted_productions[:, 1])
-		weighted_stability_sum = 0
+			if slot is None:
+				slot = slots[key] = len(entries)
+				entry = self._get(key)
 
-		previous_sum = 0
+				if entry is None:
+					missing.append(i)
+
+				entries.append(entry)
 
-		for idx, el in enumerate(cmsm):
-			if el >= self.total_consumption:
-				pp_type, _ = self.sorted_productions[idx]
-				
-				production_from_this_plant = self.total_consumption - previous_sum
-				
-				weighted_stability_sum += production_from_this_plant * self.derating[pp_type]
-				
-				break
-			
 			else:
-				pp_type, pp_power = self.sorted_productions[idx]
-				
-				weighted_stability_sum += pp_power * self.derating[pp_type]
+				repeats += 1 #repeated within the batch
+
+			rows[i] = slot
+
+		with self._lock:
+			self.hits += repeats
+
+		if missing:
+			dispatch = clear_batch(price_table, codes[missing], volumes[missing], consumptions[missing])
+			lengths = np.count_nonzero(codes[missing] != PADDING, axis = 1)
+
+			for j, i in enumerate(missing):
+				n = lengths[j]
+				marginal = int(dispatch.marginal[j])
+
+				#the marginal plant is kept as -1 when the consumption is not covered, so the entry fits a batch of any width
+				entry = (marginal if marginal < n else -1, dispatch.dispatched[j, :n].copy(), dispatch.price[j], dispatch.expenses[j], dispatch.co2[j], dispatch.stability[j])
+
+				entries[slots[keys[i]]] = entry
+				self._put(keys[i], entry)
+
+		marginal = np.array([e[0] for e in entries], dtype = np.intp)
+		marginal[marginal < 0] = width
+
+		dispatched = np.zeros((len(entries), width))
+
+		for slot, e in enumerate(entries):
+			dispatched[slot, :len(e[1])] = e[1]
+
+		values = np.array([e[2:] for e in entries], dtype = float).reshape(-1, 4)
+
+		shape = total_consumption.shape
+		price, expenses, co2, stability = values[rows].T.reshape((4,) + shape)
+
+		return BatchDispatch(marginal[rows].reshape(shape), codes.reshape(shape + (width,)), dispatched[rows].reshape(shape + (width,)), price, expenses, co2, stability)
+
+class Dispatch:
+	'''Result of clearing a merit order once. The marginal plant is found with a binary search over the cumulative supply and every metric is derived from the same dispatched volumes.'''
+
+	def __init__(self, merit_order):
+		sorted_productions = merit_order.sorted_productions
+		total_consumption = merit_order.total_consumption
+
+		codes = sorted_productions["power"]
+		volumes = sorted_productions["volume"]
+
+		unit_prices = merit_order.price_table[codes]
+
+		cmsm = np.cumsum(volumes)
+
+		#first plant whose cumulative supply covers the consumption, len(cmsm) if nothing does
+		idx = int(np.searchsorted(cmsm, total_consumption, side = "left"))
+
+		dispatched = volumes.astype(float)
+
+		if idx < len(cmsm):
+			dispatched[idx] = total_consumption - (cmsm[idx - 1] if idx > 0 else 0)
+			dispatched[idx + 1:] = 0
+			price = unit_prices[idx]
+
+		else:
+			price = 0 #consumption is not covered
+
+		self.marginal = idx
+		self.dispatched = dispatched
+		self.price = price
+		self.cost = price * total_consumption
+		self.expenses = dispatched @ unit_prices
+		self.profit = dispatched @ (price - unit_prices)
+		self.co2 = dispatched @ CO2EQ[codes]
+
+		if total_consumption <= 0:
+			self.stability = 100.0
+
+		else:
+			self.stability = (dispatched @ DERATING[codes]) / total_consumption
+
+class UnitDispatch:
+	'''Per-plant result of clearing a merit order, aligned with sorted_productions. The dispatched MW, revenue, operating cost, profit and CO2 are rows of one (5 x plants) buffer, so they are views and building them allocates a single array.'''
+
+	FIELDS = ("dispatched", "revenue", "cost", "profit", "co2")
+
+	def __init__(self, merit_order, dispatch: Dispatch):
+		codes = merit_order.sorted_productions["power"]
+
+		self.marginal = dispatch.marginal #len(sorted_productions) when the consumption is not covered
+		self.price = dispatch.price
+		self.buffer = np.empty((len(self.FIELDS), len(codes)))
+
+		self.dispatched, self.revenue, self.cost, self.profit, self.co2 = self.buffer
+
+		self.dispatched[:] = dispatch.dispatched
+		np.multiply(self.dispatched, dispatch.price, out = self.revenue)
+		np.multiply(self.dispatched, merit_order.price_table[codes], out = self.cost)
+		np.subtract(self.revenue, self.cost, out = self.profit)
+		np.multiply(self.dispatched, CO2EQ[codes], out = self.co2)
+
+#cleared merit orders shared by every MeritOrder and batch in this process, set maxsize to 0 to disable it
+dispatch_cache = DispatchCache()
+
+class MeritOrder:
+	@profiled()
+	def __init__(self, prices: dict[Power, float], productions: List[Tuple[Power, float]] | np.ndarray, total_consumption: float):
+		self.prices = prices
+		self.price_table = get_table(prices)
+		self.productions = as_productions(productions)
+		self.total_consumption = total_consumption
+		self.sorted_productions = self.productions[np.argsort(self.price_table[self.productions["power"]], kind = "stable")]
+		self.co2eq = co2eq
+		self.derating = derating
+
+		self._dispatch = None
+		self._units = None
+
+	def dispatch(self) -> Dispatch:
+		'''Clear the merit order and cache the result, so all the getters share a single pass.'''
+
+		if self._dispatch is None:
+			self._dispatch = dispatch_cache.get_dispatch(self)
+
+		return self._dispatch
+
+	@profiled()
+	def getUnitDispatch(self) -> UnitDispatch:
+		'''Get the dispatched MW, revenue, operating cost, profit and CO2 of every powerplant in merit order, and the index of the marginal one.'''
+
+		if self._units is None:
+			self._units = UnitDispatch(self, self.dispatch())
+
+		return self._units
+
+	def getPrice(self):
+		'''Get the current price of power in EUR/MWh, by ordering the powerplant according to the merit order, and getting the lowest price that satisfies the total consumption.'''
+
+		return self.dispatch().price
+
+	def getTotalCost(self):
+		'''Get the total cost of electricity production with the current consumption total.'''
+
+		return self.dispatch().cost
+
+	def getTotalProfit(self):
+		'''Get total profit in EUR for all the powerplants, that produce, with a given consumption.'''
+
+		return self.dispatch().profit
+	
+	def getTotalExpenses(self):
+		'''Get the total operating expenses in EUR of the powerplants, that produce, with a given consumption.'''
+
+		return self.dispatch().expenses
+	
+	def getReleasedCO2(self):
+		'''Get the amount of released CO2 eq. (in tonnes).'''
+
+		return self.dispatch().co2
+	
+	def getGridStability(self):
+		'''Get the grid stability coefficient.'''
 
-				previous_sum = el
-				
-		return weighted_stability_sum / self.total_consumption
+		return self.dispatch().stability
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import Scoring
+from MeritOrder import PADDING, Power, clear_batch
+from Scoring import get_balance_matrix, get_team_stats, get_teams
+
+from typing import Sequence
+import numpy as np
+
+#relative standard deviation of the output of the technologies that are not firm (see MeritOrder.derating), the others produce what they offer
+DEFAULT_UNCERTAINTY = {
+	Power.WIND: 0.35,
+	Power.PHOTOVOLTAIC: 0.25,
+}
+
+def sample_factors(uncertainty: dict, scenarios: int, rounds: int, rng: np.random.Generator) -> np.ndarray:
+	'''Sample the output factors of every technology, scenarios x rounds x technologies.
+
+	A technology's factor is shared by all its powerplants in a round, the weather is the same for every team. The uncertainty of a technology is either the relative standard deviation of a normal factor around 1 (cut at 0), or a function rng, size -> factors for any other distribution.'''
+
+	factors = np.ones((scenarios, rounds, len(Power)))
+
+	for power, spread in uncertainty.items():
+		size = (scenarios, rounds)
+
+		if callable(spread):
+			factors[..., power.value] = spread(rng, size)
+
+		else:
+			factors[..., power.value] = np.maximum(rng.normal(1.0, spread, size), 0.0)
+
+	return factors
+
+class MonteCarloResult:
+	'''Outcomes of every sampled scenario, balance (the emx score), co2 and expenses are scenarios x teams arrays.'''
+
+	METRICS = ("balance", "co2", "expenses")
+
+	def __init__(self, teams, balance, co2, expenses):
+		self.teams = teams
+		self.balance = balance
+		self.co2 = co2
+		self.expenses = expenses
+
+	def get_summary(self, percentiles: Sequence[float] = (5, 50, 95)) -> dict:
+		'''Get the expected value and the percentiles of every metric per team, e.g. summary["Team A"]["co2"]["p95"].'''
+
+		summary = {t: dict() for t in self.teams}
+
+		for metric in self.METRICS:
+			samples = getattr(self, metric)
+
+			mean = samples.mean(axis = 0)
+			quantiles = np.percentile(samples, percentiles, axis = 0)
+
+			for idx, t in enumerate(self.teams):
+				summary[t][metric] = {"mean": mean[idx], **{f"p{p:g}": q[idx] for p, q in zip(percentiles, quantiles)}}
+
+		return summary
+
+def simulate(history, scenarios: int = 1000, uncertainty: dict = None, seed: int = 0, chunksize: int = 64) -> MonteCarloResult:
+	'''Score a game under sampled renewable output instead of the offered volumes.
+
+	Every scenario scales the volumes of the uncertain technologies by their sampled factors and clears all rounds and teams again. The scenarios are cleared chunksize at a time, each chunk in one (scenarios x rounds x teams) batch, so the memory stays bounded for any number of scenarios. The same seed gives the same scenarios.'''
+
+	game = get_team_stats(history)
+	teams = get_teams(game)
+	num_rounds = len(game)
+
+	uncertainty = DEFAULT_UNCERTAINTY if uncertainty is None else uncertainty
+	factors = sample_factors(uncertainty, scenarios, num_rounds, np.random.default_rng(seed))
+
+	codes, volumes = game.get_padded()
+	consumptions = game.consumptions
+
+	#factor of every plant in every round: factors[:, round, code]
+	rounds = np.arange(num_rounds)[:, np.newaxis, np.newaxis]
+	technologies = np.where(codes == PADDING, 0, codes)
+
+	balance = np.empty((scenarios, len(teams)))
+	co2 = np.empty((scenarios, len(teams)))
+	expenses = np.empty((scenarios, len(teams)))
+
+	for start in range(0, scenarios, chunksize):
+		chunk = slice(start, min(start + chunksize, scenarios))
+
+		sampled = volumes * factors[chunk][:, rounds, technologies]
+
+		dispatch = clear_batch(Scoring.prices, np.broadcast_to(codes, sampled.shape), sampled, consumptions)
+
+		co2[chunk] = dispatch.co2.sum(axis = 1)
+		expenses[chunk] = dispatch.expenses.sum(axis = 1)
+
+		#get_balance_matrix sums over the leading rounds axis, so the scenarios go last
+		production_sums = np.moveaxis(sampled.sum(axis = -1), 0, -1)
+		balance[chunk] = get_balance_matrix(consumptions[..., np.newaxis], production_sums, num_rounds)[1].T * 100
+
+	return MonteCarloResult(teams, balance, co2, expenses)
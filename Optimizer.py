@@ -0,0 +1,140 @@
+import Scoring
+from MeritOrder import PADDING, Power, clear_batch, get_table
+from Scoring import FACTORS, building_popularity, combine_scores, ecology_score, finances_score, get_round_balance
+
+from typing import List, Sequence
+import numpy as np
+import time
+
+def evaluate_portfolios(portfolios: np.ndarray, consumptions: Sequence[float], prices = None) -> dict:
+	'''Score candidate portfolios, (candidates x technologies) MW with one plant per technology, fielded in every round against the consumptions.
+
+	All candidates and rounds are cleared in one (candidates x rounds) batch. Returns the unrounded emx, fin, eco and pop of every candidate, like calculate_final_scores would give a team that played the portfolio in every round.'''
+
+	portfolios = np.asarray(portfolios, dtype = float)
+	consumptions = np.asarray(consumptions, dtype = float).reshape(-1)
+
+	shape = (len(portfolios), len(consumptions), len(Power))
+
+	#a technology without MW is no plant at all
+	codes = np.broadcast_to(np.where(portfolios > 0, np.arange(len(Power)), PADDING)[:, np.newaxis], shape)
+	volumes = np.broadcast_to(portfolios[:, np.newaxis], shape)
+
+	dispatch = clear_batch(Scoring.prices if prices is None else prices, codes, volumes, np.broadcast_to(consumptions, shape[:2]))
+
+	total_cons = consumptions.sum()
+	balance = get_round_balance(consumptions - portfolios.sum(axis = 1)[:, np.newaxis], Scoring.BALANCE_CUTOFF_PERCENT * 0.01 * consumptions)
+
+	emx = np.sum(balance * (1 / len(consumptions)), axis = 1) * 100
+	fin = finances_score(dispatch.expenses.sum(axis = 1), total_cons, prices)
+	eco = ecology_score(dispatch.co2.sum(axis = 1), total_cons)
+
+	return {"emx": emx, "fin": fin, "eco": eco, "pop": (emx + fin + eco + 2 * building_popularity(total_cons)) / 5}
+
+class PortfolioSearch:
+	'''Search of the best portfolios for the given consumptions under capacity and budget constraints.
+
+	capacity caps the MW of every technology (default: the largest consumption, more is never needed), costs are the costs per MW of the technologies and budget caps their total, step rounds the MW down to the sizes of the plants that can be built.'''
+
+	def __init__(self, consumptions: Sequence[float], capacity = None, costs = None, budget: float = None, step: float = 0, prices = None, factor: str = "pop", seed: int = 0):
+		self.consumptions = np.asarray(consumptions, dtype = float).reshape(-1)
+		self.capacity = np.full(len(Power), self.consumptions.max()) if capacity is None else get_table(capacity)
+		self.costs = None if costs is None else get_table(costs)
+		self.budget = budget
+		self.step = step
+		self.prices = prices
+		self.factor = factor
+
+		self.rng = np.random.default_rng(seed)
+
+		self.portfolios = np.zeros((0, len(Power)))
+		self.objective = np.zeros(0)
+
+	def project(self, portfolios: np.ndarray) -> np.ndarray:
+		'''Make candidates feasible: clip them to the capacity, scale them down into the budget and round them to the step.'''
+
+		portfolios = np.clip(portfolios, 0.0, self.capacity)
+
+		if self.costs is not None and self.budget is not None:
+			spent = portfolios @ self.costs
+			portfolios = portfolios * np.minimum(1.0, np.divide(self.budget, spent, out = np.ones(len(spent)), where = spent > 0))[:, np.newaxis]
+
+		if self.step:
+			portfolios = np.floor(portfolios / self.step + 1e-9) * self.step
+
+		return portfolios
+
+	def sample(self, size: int) -> np.ndarray:
+		'''Random candidates: a random technology mix scaled to a total around the range of the consumptions.'''
+
+		shares = self.rng.dirichlet(np.ones(len(Power)), size)
+		totals = self.rng.uniform(0.95 * self.consumptions.min(), 1.05 * self.consumptions.max(), size)
+
+		return self.project(shares * totals[:, np.newaxis])
+
+	def mutate(self, parents: np.ndarray, size: int) -> np.ndarray:
+		'''Neighbours of the parents: some MW moved from one technology to another, and half of them resized by a few percent.'''
+
+		portfolios = parents[self.rng.integers(len(parents), size = size)].copy()
+		rows = np.arange(size)
+
+		source = self.rng.integers(len(Power), size = size)
+		target = self.rng.integers(len(Power), size = size)
+
+		moved = np.minimum(portfolios[rows, source], self.rng.uniform(0.0, 0.25, size) * portfolios.sum(axis = 1))
+		portfolios[rows, source] -= moved
+		portfolios[rows, target] += moved
+
+		resized = self.rng.random(size) < 0.5
+		portfolios[resized] *= self.rng.normal(1.0, 0.02, (np.count_nonzero(resized), 1))
+
+		return self.project(portfolios)
+
+	def add(self, portfolios: np.ndarray, keep: int):
+		'''Evaluate candidates and keep the keep best distinct portfolios found so far.'''
+
+		objective = evaluate_portfolios(portfolios, self.consumptions, self.prices)[self.factor]
+
+		portfolios = np.concatenate([self.portfolios, portfolios])
+		objective = np.concatenate([self.objective, objective])
+
+		portfolios, unique = np.unique(np.round(portfolios, 6), axis = 0, return_index = True)
+		objective = objective[unique]
+
+		best = np.argsort(-objective, kind = "stable")[:keep]
+
+		self.portfolios = portfolios[best]
+		self.objective = objective[best]
+
+	def run(self, time_budget: float = 0.1, batch: int = 4096, elite: int = 64):
+		'''Sample a first batch, then improve the elite portfolios with batches of neighbours until the time budget in seconds runs out.'''
+
+		deadline = time.perf_counter() + time_budget
+
+		self.add(self.sample(batch), elite)
+
+		while time.perf_counter() < deadline:
+			#a quarter of fresh samples keeps the search from settling on one mix
+			self.add(np.concatenate([self.mutate(self.portfolios, batch - batch // 4), self.sample(batch // 4)]), elite)
+
+	def get_top(self, k: int = 5) -> List[dict]:
+		'''The k best portfolios found, as {"portfolio": {Power: MW}, "scores": rounded scores}.'''
+
+		portfolios = self.portfolios[:k]
+		scores = evaluate_portfolios(portfolios, self.consumptions, self.prices)
+
+		popularity = building_popularity(self.consumptions.sum())
+		rounded = combine_scores(scores["emx"], scores["fin"], scores["eco"], popularity)
+
+		return [
+			{"portfolio": {p: float(x[p.value]) for p in Power if x[p.value] > 0}, "scores": {f: rounded[f][idx] for f in FACTORS}}
+			for idx, x in enumerate(portfolios)
+		]
+
+def optimize_portfolio(consumptions: Sequence[float], capacity = None, costs = None, budget: float = None, step: float = 0, factor: str = "pop", time_budget: float = 0.1, k: int = 5, seed: int = 0) -> List[dict]:
+	'''Find the k best portfolios for the consumptions of the coming rounds within time_budget seconds, e.g. for a computer-controlled team or a hint.'''
+
+	search = PortfolioSearch(consumptions, capacity, costs, budget, step, factor = factor, seed = seed)
+	search.run(time_budget)
+
+	return search.get_top(k)
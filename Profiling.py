@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from functools import wraps
+import time
+import sys
+
+_enabled = False
+
+#stage -> [calls, cumulative seconds, slowest call in seconds, net allocated memory blocks]
+_stats = dict()
+
+def profiled(stage: str = None):
+	'''Decorator recording the calls, wall time and net allocated memory blocks of a function as a stage while profiling is enabled. When it is disabled, the overhead is one extra call and a flag check per call, so only coarse stages are decorated, not the getters of a single market.'''
+
+	def decorate(func):
+		name = stage or f"{func.__module__}.{func.__qualname__}"
+
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			if not _enabled:
+				return func(*args, **kwargs)
+
+			blocks = sys.getallocatedblocks()
+			start = time.perf_counter()
+
+			try:
+				return func(*args, **kwargs)
+
+			finally:
+				elapsed = time.perf_counter() - start
+				record(name, elapsed, sys.getallocatedblocks() - blocks)
+
+		return wrapper
+
+	return decorate
+
+def record(stage: str, elapsed: float, net_blocks: int = 0):
+	'''Add one call of a stage to the statistics.'''
+
+	stats = _stats.get(stage)
+
+	if stats is None:
+		stats = _stats[stage] = [0, 0.0, 0.0, 0]
+
+	stats[0] += 1
+	stats[1] += elapsed
+	stats[2] = max(stats[2], elapsed)
+	stats[3] += net_blocks
+
+def enable():
+	global _enabled
+	_enabled = True
+
+def disable():
+	global _enabled
+	_enabled = False
+
+def is_enabled() -> bool:
+	return _enabled
+
+def reset():
+	'''Forget the statistics recorded so far.'''
+
+	_stats.clear()
+
+def get_report() -> dict:
+	'''Get the statistics per stage: call count, cumulative and slowest wall time in seconds, and the net number of memory blocks allocated by the stage (nested stages are included in their callers).'''
+
+	return {
+		stage: {"calls": calls, "time": total, "max_time": slowest, "net_blocks": net_blocks}
+		for stage, (calls, total, slowest, net_blocks) in _stats.items()
+	}
+
+def format_report(report: dict = None) -> str:
+	'''Format a report as a table, the slowest stages first.'''
+
+	report = get_report() if report is None else report
+
+	lines = [f"{'stage':<40} {'calls':>8} {'time [ms]':>12} {'max [ms]':>10} {'net blocks':>12}"]
+
+	for stage, stats in sorted(report.items(), key = lambda x: -x[1]["time"]):
+		lines.append(f"{stage:<40} {stats['calls']:>8} {stats['time'] * 1000:>12.3f} {stats['max_time'] * 1000:>10.3f} {stats['net_blocks']:>12}")
+
+	return "\n".join(lines)
+
+@contextmanager
+def profile():
+	'''Enable profiling for a block with fresh statistics, get_report() still holds them after the block.
+
+		with profile():
+			calculate_final_scores(history)
+
+		print(format_report())
+	'''
+
+	was_enabled = _enabled
+
+	reset()
+	enable()
+
+	try:
+		yield
+
+	finally:
+		if not was_enabled:
+			disable()
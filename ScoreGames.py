@@ -0,0 +1,164 @@
+from BulkScoring import HISTORY_SUFFIXES, get_history_files, score_games
+from Scoring import FACTORS
+
+from typing import List
+import numpy as np
+import argparse
+import json
+import csv
+import sys
+import os
+
+FORMATS = ["csv", "json", "npz", "parquet"]
+
+def get_paths(inputs) -> List[str]:
+	'''Expand the input arguments into history files, a directory stands for every history file in it.'''
+
+	paths = []
+
+	for i in inputs:
+		if os.path.isdir(i):
+			paths.extend(get_history_files(i))
+
+		else:
+			paths.append(i)
+
+	return paths
+
+def get_rows(results) -> List[dict]:
+	'''Flatten (path, scores) pairs into one row per game and team.'''
+
+	return [{"game": path, "team": team, **{f: float(s[f]) for f in FACTORS}} for path, scores in results for team, s in scores.items()]
+
+def get_format(path, default = "csv") -> str:
+	if path is None:
+		return default
+
+	suffix = os.path.splitext(path)[1].lstrip(".")
+
+	return suffix if suffix in FORMATS else default
+
+def write_csv(rows, f):
+	writer = csv.DictWriter(f, fieldnames = ["game", "team", *FACTORS], lineterminator = "\n")
+	writer.writeheader()
+	writer.writerows(rows)
+
+def write_json(rows, f):
+	games = dict()
+
+	for row in rows:
+		games.setdefault(row["game"], dict())[row["team"]] = {k: row[k] for k in FACTORS}
+
+	json.dump(games, f, indent = "\t")
+	f.write("\n")
+
+def get_columns(rows) -> dict:
+	columns = {k: np.array([r[k] for r in rows], dtype = str) for k in ["game", "team"]}
+	columns.update({k: np.array([r[k] for r in rows], dtype = float) for k in FACTORS})
+
+	return columns
+
+def write_npz(rows, path):
+	np.savez(path, **get_columns(rows))
+
+def write_parquet(rows, path):
+	try:
+		import pyarrow
+		import pyarrow.parquet
+
+	except ImportError:
+		raise SystemExit("parquet output needs pyarrow, use --format npz for columnar output without it")
+
+	pyarrow.parquet.write_table(pyarrow.table(get_columns(rows)), path)
+
+def write_scores(rows, path = None, output_format = "csv"):
+	'''Write the score rows to path, or to stdout for the text formats.'''
+
+	if output_format in ("npz", "parquet"):
+		if path is None:
+			raise SystemExit(f"{output_format} output needs --output")
+
+		(write_npz if output_format == "npz" else write_parquet)(rows, path)
+		return
+
+	write = write_csv if output_format == "csv" else write_json
+
+	if path is None:
+		write(rows, sys.stdout)
+
+	else:
+		with open(path, "w", newline = "") as f:
+			write(rows, f)
+
+def _strip_suffix(path) -> str:
+	for suffix in HISTORY_SUFFIXES:
+		path = path.removesuffix(suffix)
+
+	return path
+
+def get_plot_names(paths) -> List[str]:
+	'''Names of the plots of games: their paths relative to the common directory of the games, without the history suffix unless two games differ only in it.'''
+
+	paths = [os.path.abspath(p) for p in paths]
+
+	if not paths:
+		return []
+
+	root = os.path.commonpath([os.path.dirname(p) for p in paths])
+	relative = [os.path.relpath(p, root) for p in paths]
+	names = [_strip_suffix(r) for r in relative]
+
+	#games that only differ in the suffix keep it, a file given twice keeps one name
+	files = dict()
+
+	for r, n in zip(relative, names):
+		files.setdefault(n, set()).add(r)
+
+	return [n if len(files[n]) == 1 else r for r, n in zip(relative, names)]
+
+def plot_games(results, directory):
+	'''Render the bar chart of main.plot_scores of every game to directory/<game>.png without a display, <game> as given by get_plot_names.'''
+
+	from main import plot_scores
+
+	try:
+		import matplotlib
+
+	except ImportError:
+		raise SystemExit("--plot-dir needs matplotlib")
+
+	names = get_plot_names([path for path, _ in results])
+
+	for name, (_, scores) in zip(names, results):
+		plot_path = os.path.join(directory, name + ".png")
+		os.makedirs(os.path.dirname(plot_path), exist_ok = True)
+
+		plot_scores(scores, plot_path)
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description = "Score archived games in parallel like calculate_final_scores.")
+	parser.add_argument("inputs", nargs = "+", help = "history files (.json, .jsonl round logs, .npz columnar stores) or directories of them")
+	parser.add_argument("-o", "--output", help = "output file, stdout when omitted (csv and json only)")
+	parser.add_argument("-f", "--format", choices = FORMATS, help = "output format, guessed from the output suffix (default: csv)")
+	parser.add_argument("-p", "--processes", type = int, help = "worker processes (default: one per CPU)")
+	parser.add_argument("--chunksize", type = int, default = 4, help = "games handed to a worker at once")
+	parser.add_argument("--plot-dir", help = "also render the per-factor bar chart of every game into this directory")
+
+	args = parser.parse_args(argv)
+
+	paths = get_paths(args.inputs)
+	missing = [p for p in paths if not os.path.isfile(p)]
+
+	if missing:
+		parser.error(f"no such history file: {', '.join(missing)}")
+
+	results = list(zip(paths, score_games(paths, args.processes, args.chunksize)))
+
+	write_scores(get_rows(results), args.output, args.format or get_format(args.output))
+
+	if args.plot_dir:
+		plot_games(results, args.plot_dir)
+
+
+if __name__ == "__main__":
+	main()
@@ -1,9 +1,8 @@
-from collections import defaultdict
-from MeritOrder import MeritOrder, Power
-from typing import List, Tuple, Dict
+from GameHistory import GameHistory
+from Profiling import profiled
+from MeritOrder import Power, BatchDispatch, as_productions, clear_batch, dispatch_cache, get_table, pack_productions
+from typing import List, Tuple
 import numpy as np
-import json
-from copy import deepcopy
 
 prices = {
 	Power.COAL: 101,
@@ -29,22 +28,18 @@ co2eq = {
 
 BALANCE_CUTOFF_PERCENT = 1 #percent
 
+FACTORS = ("emx", "fin", "eco", "pop") #the scores of a team, as combine_scores and calculate_final_scores give them
+
 MAX_POPULARITY_MW = 5210
 
-def get_team_stats(history):
-	team_stats = defaultdict()
+@profiled()
+def get_team_stats(history) -> GameHistory:
+	'''Get the columnar GameHistory of a game, team_stats[team] holds views of the team's "productions", "consumptions" and "production_sums".'''
 
-	for t in history[0]:
-		team_stats[t] = dict()
-		team_stats[t]["productions"] = []
-		team_stats[t]["consumptions"] = []
-	
-	for r in history: #for each round
-		for team in r:
-			team_stats[team]["productions"].append(r[team]["productions"])
-			team_stats[team]["consumptions"].append(r[team]["total_consumption"])
+	if isinstance(history, GameHistory):
+		return history
 
-	return team_stats
+	return GameHistory.from_rounds(history)
 
 def get_last_building_consumption(team_stats, team):
 	return team_stats[team]["consumptions"][-1]
@@ -53,6 +48,9 @@ def get_num_rounds(history):
 	return len(history)
 
 def get_teams(history):
+	if isinstance(history, GameHistory):
+		return list(history.teams)
+
 	return list(history[0].keys())
 
 def get_total_consumption(team_stats, team):
@@ -65,105 +63,108 @@ def get_max_co2(team_stats, team):
 	total_cons = get_total_consumption(team_stats, team)
 	return co2eq[Power.COAL] * total_cons
 
-def get_co2(team_stats, team):
-	consumptions = team_stats[team]["consumptions"]
-	productions = team_stats[team]["productions"]
+@profiled()
+def clear_history(history) -> BatchDispatch:
+	'''Clear the markets of every team in every round in one batch, the result arrays are rounds x teams.
+
+	This skips the dispatch cache: clearing a whole game in one batch costs less per market than fingerprinting it.'''
+
+	game = get_team_stats(history)
+	codes, volumes = game.get_padded()
+
+	return clear_batch(prices, codes, volumes, game.consumptions)
+
+@profiled()
+def get_dispatch(team_stats, team) -> BatchDispatch:
+	'''Get the cleared markets of a team for all rounds, they are cleared in one batch and kept in team_stats for every metric.'''
+
+	stats = team_stats[team]
 
-	co2 = []
+	if "dispatch" not in stats:
+		codes, volumes = pack_productions(stats["productions"])
+		stats["dispatch"] = dispatch_cache.clear(prices, codes, volumes, stats["consumptions"])
 
-	for (c, p) in zip(consumptions, productions):
-		mo = MeritOrder(prices, p, c)
-		co2.append(mo.getReleasedCO2())
+	return stats["dispatch"]
 
-	return np.sum(co2)
+def get_co2(team_stats, team):
+	return np.sum(get_dispatch(team_stats, team).co2)
 
+@profiled()
 def get_ecology_score(team_stats, team):
-	min_co2 = get_min_co2()
-	max_co2 = get_max_co2(team_stats, team)
-	co2 = get_co2(team_stats, team)
+	return ecology_score(get_co2(team_stats, team), get_total_consumption(team_stats, team))
 
-	if max_co2 == min_co2:
-		return 100.0
-	
-	score = 100 * (1 - (co2 - min_co2) / (max_co2 - min_co2))
+def ecology_score(co2, total_cons, co2_table = None):
+	'''Ecology score from the released CO2 and the total consumption of a team, elementwise on arrays. The worst case is coal from co2_table (default co2eq).'''
+
+	min_co2 = get_min_co2()
+	max_co2 = get_table(co2eq if co2_table is None else co2_table)[..., Power.COAL.value] * total_cons
 
-	return max(0, min(100, score))
+	return _linear_score(co2, min_co2, max_co2, inverse = True)
 
 def get_max_price(team_stats, team):
 	total_cons = get_total_consumption(team_stats, team)
 	return prices[Power.GAS] * total_cons
 
 def get_expenses(team_stats, team):
-	consumptions = team_stats[team]["consumptions"]
-	productions = team_stats[team]["productions"]
-
-	expenses = []
-
-	for (c, p) in zip(consumptions, productions):
-		mo = MeritOrder(prices, p, c)
-		expenses.append(mo.getTotalExpenses())
-
-	return np.sum(expenses)
+	return np.sum(get_dispatch(team_stats, team).expenses)
 
 def get_min_price():
 	return 0
 
+@profiled()
 def get_finances_score(team_stats, team):
-	min_exp = get_min_price()
-	max_exp = get_max_price(team_stats, team)
-	exp = get_expenses(team_stats, team)
+	return finances_score(get_expenses(team_stats, team), get_total_consumption(team_stats, team))
 
-	if max_exp == min_exp:
-		return 100.0
-	
-	score = 100 * (1 - (exp - min_exp) / (max_exp - min_exp))
+def finances_score(exp, total_cons, price_table = None):
+	'''Finances score from the expenses and the total consumption of a team, elementwise on arrays. The worst case is gas from price_table (default prices).'''
+
+	min_exp = get_min_price()
+	max_exp = get_table(prices if price_table is None else price_table)[..., Power.GAS.value] * total_cons
 
-	return max(0, min(100, score))
+	return _linear_score(exp, min_exp, max_exp, inverse = True)
 
 def get_prod_sums(prod):
-	res = []
-	
-	for p in prod:
-		res.append(sum(x for _,x in p))
+	'''Total production of every round, from the productions of a team per round.'''
 
-	return res
+	return [as_productions(p)["volume"].sum() for p in prod]
 
 def get_prod_diffs(team_stats, team):
+	'''Production differences, consumptions and total productions of a team in every round, from the production sums of the GameHistory.'''
+
 	consumptions = np.array(team_stats[team]["consumptions"])
-	productions = np.array(get_prod_sums(team_stats[team]["productions"]))
+	productions = np.array(team_stats[team]["production_sums"])
 
 	return (consumptions - productions), consumptions, productions
 
-def get_balance(team_stats, team, num_rounds):
-	pd, c, p = get_prod_diffs(team_stats, team)
+def get_round_balance(pdif, op):
+	'''Balance of rounds from the production differences and the allowed tolerances, 1 for an exact match. Works elementwise on arrays of any shape.'''
 
-	one_round = 1 / num_rounds
+	err = np.abs(pdif)
+	ratio = np.divide(err, op, out = np.zeros(np.shape(err)), where = np.asarray(op) != 0)
 
-	one_perc = []
+	return np.where(pdif == 0, 1.0, np.where(err > op, 0.0, ratio))
 
-	for r in c:
-		one_perc.append(BALANCE_CUTOFF_PERCENT * 0.01 * r)
+@profiled()
+def get_balance_matrix(consumptions, productions, num_rounds):
+	'''Balance of every team in every round at once from rounds x teams consumption and production matrices. Returns the per-round balances and the balance score of every team.'''
 
-	balance_stats = []
+	consumptions = np.asarray(consumptions, dtype = float)
 
-	for pdif, op in zip(pd, one_perc):
-		if pdif == 0:
-			balance_stats.append(one_round)
-		
-		elif abs(pdif) > op:
-			balance_stats.append(0)
+	one_perc = BALANCE_CUTOFF_PERCENT * 0.01 * consumptions
 
-		else:
-			err = (abs(pdif) / op) * one_round if op != 0 else 0
+	balance_stats = get_round_balance(consumptions - productions, one_perc) * (1 / num_rounds)
 
-			balance_stats.append(err)
+	return balance_stats, np.sum(balance_stats, axis = 0)
 
-		#print(f"op: {op}, abspdif: {abs(pdif)}")
+def get_balance(team_stats, team, num_rounds):
+	stats = team_stats[team]
 
-	#print(f"bs: {balance_stats}")
+	if "balance" in stats: #filled in for every team at once by calculate_final_scores
+		return stats["balance"]
 
-	return balance_stats
+	return get_balance_matrix(stats["consumptions"], stats["production_sums"], num_rounds)[0]
 
+@profiled()
 def get_balance_score(team_stats, team, num_rounds):
 	bal = get_balance(team_stats, team, num_rounds)
 
@@ -175,37 +176,62 @@ def get_max_building_popularity():
 def get_min_building_popularity():
 	return 0
 
+@profiled()
 def get_building_popularity(team_stats, team):
+	return building_popularity(get_total_consumption(team_stats, team))
+
+def building_popularity(pop):
+	'''Popularity of the buildings from the total consumption of a team.'''
+
 	min_pop = get_min_building_popularity()
 	max_pop = get_max_building_popularity()
 
-	pop = get_total_consumption(team_stats, team)
+	return _linear_score(pop, min_pop, max_pop)
 
-	if max_pop == min_pop:
-		return 100.0
+def _linear_score(value, low, high, inverse = False):
+	'''Position of value between low and high scaled to 0 - 100 and clipped, 100 when the range is empty. Scalars stay scalars.'''
 
-	score = 100 * (pop - min_pop) / (max_pop - min_pop)
+	span = np.asarray(high - low, dtype = float)
+	ratio = np.divide(value - low, span, out = np.zeros(np.broadcast_shapes(np.shape(value), span.shape)), where = span != 0)
 
-	return max(0, min(100, score))
+	score = 100 * (1 - ratio) if inverse else 100 * ratio
 
+	return np.where(span == 0, 100.0, np.clip(score, 0, 100))[()]
+
+@profiled()
 def get_scores(team_stats, team, num_rounds):
 	emx = get_balance_score(team_stats, team, num_rounds) * 100
 	fin = get_finances_score(team_stats, team)
 	eco = get_ecology_score(team_stats, team)
-	pop = (emx + fin + eco + 2 * get_building_popularity(team_stats, team)) / 5 #0 - 100
+
+	return combine_scores(emx, fin, eco, get_building_popularity(team_stats, team))
+
+def combine_scores(emx, fin, eco, popularity):
+	'''Combine the factor scores into the rounded score dict of a team.'''
+
+	pop = (emx + fin + eco + 2 * popularity) / 5 #0 - 100
 	
 	return {
-		"emx" : round(emx, 2),
-		"fin" : round(fin, 2),
-		"eco" : round(eco, 2),
-		"pop" : round(pop, 2),
+		"emx" : np.round(emx, 2),
+		"fin" : np.round(fin, 2),
+		"eco" : np.round(eco, 2),
+		"pop" : np.round(pop, 2),
 	}
 
+@profiled()
 def calculate_final_scores(history):
 	ts = get_team_stats(history)
-	teams = get_teams(history)
+	teams = get_teams(ts)
 
-	num_rounds = get_num_rounds(history)
+	num_rounds = get_num_rounds(ts)
+
+	dispatch = clear_history(ts)
+
+	balance = get_balance_matrix(ts.consumptions, ts.get_production_sums(), num_rounds)[0]
+
+	for idx, t in enumerate(teams):
+		ts[t]["dispatch"] = dispatch[:, idx]
+		ts[t]["balance"] = balance[:, idx]
 
 	scores = dict()
 
@@ -214,91 +240,111 @@ def calculate_final_scores(history):
 
 	return scores
 
+def get_total_scores(teams, num_rounds, consumption, co2, expenses, balance) -> dict:
+	'''Scores of every team from its totals over the rounds, given as arrays aligned with teams. balance is the sum of the round balances.'''
+
+	emx = balance / num_rounds * 100
+	fin = finances_score(expenses, consumption)
+	eco = ecology_score(co2, consumption)
+
+	scores = combine_scores(emx, fin, eco, building_popularity(consumption))
+
+	return {t: {k: v[idx] for k, v in scores.items()} for idx, t in enumerate(teams)}
+
+@profiled()
+def get_round_terms(round_dict, teams) -> Tuple[np.ndarray, ...]:
+	'''Clear a closed round and get the consumption, production, CO2, expenses and balance of every team in it, arrays aligned with teams.'''
+
+	productions = [round_dict[t]["productions"] for t in teams]
+	consumptions = np.array([round_dict[t]["total_consumption"] for t in teams], dtype = float)
+
+	codes, volumes = pack_productions(productions)
+	dispatch = dispatch_cache.clear(prices, codes, volumes, consumptions)
+
+	production_sums = volumes.sum(axis = 1)
+	balance = get_round_balance(consumptions - production_sums, BALANCE_CUTOFF_PERCENT * 0.01 * consumptions)
+
+	return consumptions, production_sums, dispatch.co2, dispatch.expenses, balance
+
+def score_rounds(rounds) -> dict:
+	'''Score a game given as an iterable of rounds, e.g. HistoryIO.iter_rounds over a JSON Lines log, keeping only O(teams) state.'''
+
+	scorer = IncrementalScorer()
+
+	for r in rounds:
+		scorer.add_round(r)
+
+	return scorer.get_scores()
+
+class IncrementalScorer:
+	'''Live scoring of a running game. Each round is folded into running sums per team, so the current scores are read in O(teams) and match calculate_final_scores on the same history.'''
+
+	def __init__(self, teams: List[str] = None):
+		self.teams = None
+		self.num_rounds = 0
+
+		if teams is not None:
+			self._set_teams(teams)
+
+	def _set_teams(self, teams):
+		self.teams = list(teams)
+		self._team_index = {t: idx for idx, t in enumerate(self.teams)}
+
+		self.co2 = np.zeros(len(self.teams))
+		self.expenses = np.zeros(len(self.teams))
+		self.consumption = np.zeros(len(self.teams))
+		self.balance = np.zeros(len(self.teams)) #sum of the round balances, divided by the number of rounds when read
+
+	def get_round_teams(self, round_dict) -> List[str]:
+		'''Teams a round is cleared against: the teams of the game, or of the round when it is the first one.'''
+
+		return list(round_dict.keys()) if self.teams is None else self.teams
+
+	@profiled()
+	def add_round(self, round_dict):
+		'''Fold a closed round, given as {team: {"productions": ..., "total_consumption": ...}}, into the running sums.'''
+
+		teams = self.get_round_teams(round_dict)
+
+		#cleared before anything is set, so a round that fails leaves the scorer as it was
+		self.add_terms(get_round_terms(round_dict, teams), teams)
+
+	def add_terms(self, terms, teams):
+		'''Fold the terms of a round cleared with get_round_terms against teams, the teams of the game, into the running sums.'''
+
+		if self.teams is None:
+			self._set_teams(teams)
+
+		consumptions, _, co2, expenses, balance = terms
+
+		self.co2 += co2
+		self.expenses += expenses
+		self.consumption += consumptions
+		self.balance += balance
+
+		self.num_rounds += 1
+
+	def get_team_scores(self, team):
+		idx = self._team_index[team]
+
+		emx = self.balance[idx] / self.num_rounds * 100
+		fin = finances_score(self.expenses[idx], self.consumption[idx])
+		eco = ecology_score(self.co2[idx], self.consumption[idx])
+
+		return combine_scores(emx, fin, eco, building_popularity(self.consumption[idx]))
+
+	def get_scores(self):
+		'''Get the current scores of every team, like calculate_final_scores.'''
+
+		if self.num_rounds == 0:
+			return dict()
+
+		return get_total_scores(self.teams, self.num_rounds, self.consumption, self.co2, self.expenses, self.balance)
+
 
 if __name__ == "__main__":
-	history = [
-		# --- Round 1 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 1500), (Power.WIND, 100)], 'total_consumption': 1600},
-			"Team B": {'productions': [(Power.COAL, 1000), (Power.GAS, 800)], 'total_consumption': 1800},
-			"Team C": {'productions': [(Power.NUCLEAR, 800), (Power.GAS, 400), (Power.WIND, 100)], 'total_consumption': 1300},
-			"Team D": {'productions': [(Power.WATER, 2500)], 'total_consumption': 2000},
-			"Team E": {'productions': [(Power.WIND, 1200), (Power.PHOTOVOLTAIC, 400)], 'total_consumption': 1500},
-		},
-		# --- Round 2 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 1500), (Power.WIND, 300)], 'total_consumption': 1800},
-			"Team B": {'productions': [(Power.COAL, 1200), (Power.GAS, 800)], 'total_consumption': 2000},
-			"Team C": {'productions': [(Power.NUCLEAR, 800), (Power.GAS, 500), (Power.WIND, 200)], 'total_consumption': 1500},
-			"Team D": {'productions': [(Power.WATER, 2500)], 'total_consumption': 2200},
-			"Team E": {'productions': [(Power.WIND, 1400), (Power.PHOTOVOLTAIC, 600)], 'total_consumption': 1700}, # Barely meeting demand
-		},
-		# --- Round 3 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 1500), (Power.WIND, 500), (Power.PHOTOVOLTAIC, 10)], 'total_consumption': 2000},
-			"Team B": {'productions': [(Power.COAL, 1300), (Power.GAS, 900)], 'total_consumption': 2200},
-			"Team C": {'productions': [(Power.NUCLEAR, 900), (Power.GAS, 500), (Power.WIND, 300)], 'total_consumption': 1700},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.GAS, 100)], 'total_consumption': 2400}, # Demand exceeds hydro
-			"Team E": {'productions': [(Power.WIND, 1000), (Power.PHOTOVOLTAIC, 400)], 'total_consumption': 1900}, # BLACKOUT!
-		},
-		# --- Round 4 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2000), (Power.WIND, 500)], 'total_consumption': 2200}, # New nuclear plant
-			"Team B": {'productions': [(Power.COAL, 1500), (Power.GAS, 1000)], 'total_consumption': 2400},
-			"Team C": {'productions': [(Power.NUCLEAR, 900), (Power.GAS, 600), (Power.WIND, 400)], 'total_consumption': 1900},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.GAS, 300)], 'total_consumption': 2600},
-			"Team E": {'productions': [(Power.WIND, 2000), (Power.PHOTOVOLTAIC, 800)], 'total_consumption': 2100},
-		},
-		# --- Round 5 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2000), (Power.WIND, 700), (Power.PHOTOVOLTAIC, 100)], 'total_consumption': 2400},
-			"Team B": {'productions': [(Power.COAL, 1600), (Power.GAS, 1100)], 'total_consumption': 2600},
-			"Team C": {'productions': [(Power.NUCLEAR, 1000), (Power.GAS, 600), (Power.WIND, 500)], 'total_consumption': 2100},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.GAS, 500)], 'total_consumption': 2800},
-			"Team E": {'productions': [(Power.WIND, 1500), (Power.PHOTOVOLTAIC, 600), (Power.GAS, 100)], 'total_consumption': 2300}, # Added a gas peaker
-		},
-		# --- Round 6 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2000), (Power.WIND, 900), (Power.PHOTOVOLTAIC, 300)], 'total_consumption': 2600},
-			"Team B": {'productions': [(Power.COAL, 1800), (Power.GAS, 1200)], 'total_consumption': 2800},
-			"Team C": {'productions': [(Power.NUCLEAR, 1000), (Power.GAS, 700), (Power.WIND, 600)], 'total_consumption': 2300},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.COAL, 500)], 'total_consumption': 3000}, # Built a coal plant
-			"Team E": {'productions': [(Power.WIND, 1200), (Power.PHOTOVOLTAIC, 500), (Power.GAS, 100)], 'total_consumption': 2500}, # BLACKOUT!
-		},
-		# --- Round 7 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2500), (Power.WIND, 1000)], 'total_consumption': 2800}, # Another nuclear plant
-			"Team B": {'productions': [(Power.COAL, 2000), (Power.GAS, 1200)], 'total_consumption': 3000},
-			"Team C": {'productions': [(Power.NUCLEAR, 1200), (Power.GAS, 700), (Power.WIND, 700)], 'total_consumption': 2500},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.COAL, 800)], 'total_consumption': 3200},
-			"Team E": {'productions': [(Power.WIND, 2500), (Power.PHOTOVOLTAIC, 1000), (Power.GAS, 200)], 'total_consumption': 2700},
-		},
-		# --- Round 8 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2500), (Power.WIND, 1200), (Power.PHOTOVOLTAIC, 300)], 'total_consumption': 3000},
-			"Team B": {'productions': [(Power.COAL, 2200), (Power.GAS, 1300)], 'total_consumption': 3200},
-			"Team C": {'productions': [(Power.NUCLEAR, 1200), (Power.GAS, 800), (Power.WIND, 800)], 'total_consumption': 2700},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.COAL, 1000)], 'total_consumption': 3400},
-			"Team E": {'productions': [(Power.WIND, 1800), (Power.PHOTOVOLTAIC, 800), (Power.GAS, 200)], 'total_consumption': 2900}, # Another blackout!
-		},
-		# --- Round 9 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 2500), (Power.WIND, 1500), (Power.PHOTOVOLTAIC, 400)], 'total_consumption': 3200},
-			"Team B": {'productions': [(Power.COAL, 2400), (Power.GAS, 1400)], 'total_consumption': 3400},
-			"Team C": {'productions': [(Power.NUCLEAR, 1200), (Power.GAS, 900), (Power.WIND, 900)], 'total_consumption': 2900},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.COAL, 1200)], 'total_consumption': 3600},
-			"Team E": {'productions': [(Power.WIND, 3000), (Power.PHOTOVOLTAIC, 1200), (Power.GAS, 200)], 'total_consumption': 3100},
-		},
-		# --- Round 10 ---
-		{
-			"Team A": {'productions': [(Power.NUCLEAR, 3000), (Power.WIND, 1500)], 'total_consumption': 3400},
-			"Team B": {'productions': [(Power.COAL, 2500), (Power.GAS, 1500)], 'total_consumption': 3600},
-			"Team C": {'productions': [(Power.NUCLEAR, 1500), (Power.GAS, 1000), (Power.WIND, 1000)], 'total_consumption': 3100},
-			"Team D": {'productions': [(Power.WATER, 2500), (Power.COAL, 1500)], 'total_consumption': 3800},
-			"Team E": {'productions': [(Power.WIND, 2000), (Power.PHOTOVOLTAIC, 1000), (Power.GAS, 500)], 'total_consumption': 3300},
-		},
-	]
-	
+	from SampleHistory import history
+
 	final_scores = calculate_final_scores(history)
 
-	print(f"fs: {final_scores}")
\ No newline at end of file
+	print(f"fs: {final_scores}")
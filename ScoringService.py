@@ -0,0 +1,280 @@
+from HistoryIO import decode_round
+from Leaderboard import Leaderboard
+from Scoring import FACTORS, IncrementalScorer, get_round_terms
+
+from concurrent.futures import Executor
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import asyncio
+import json
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+MAX_BODY = 16 * 1024 * 1024 #bytes, a request body is buffered whole
+
+class Session:
+	'''Live state of one game: the incremental scores, their leaderboard and the queues of the clients subscribed to them.'''
+
+	def __init__(self):
+		self.scorer = IncrementalScorer()
+		self.leaderboard = Leaderboard()
+		self.lock = asyncio.Lock() #rounds of a session are folded in one at a time
+		self.subscribers = set()
+		self.users = 0 #requests and streams using the session, an empty session is dropped when the last one ends
+
+	def get_scores(self) -> dict:
+		return {
+			"rounds": self.scorer.num_rounds,
+			"scores": {team: {k: float(v) for k, v in s.items()} for team, s in self.scorer.get_scores().items()},
+		}
+
+	def get_leaderboard(self, factor: str, k: int = 10, team = None) -> dict:
+		board = {"factor": factor, "teams": len(self.leaderboard), "top": [{"team": t, "score": s} for t, s in self.leaderboard.get_top(factor, k)]}
+
+		if team is not None:
+			board["rank"] = self.leaderboard.get_rank(team, factor)
+			board["percentile"] = self.leaderboard.get_percentile(team, factor)
+
+		return board
+
+	def publish(self, scores):
+		for queue in self.subscribers:
+			queue.put_nowait(scores)
+
+class ScoringService:
+	'''Asyncio HTTP service scoring live games.
+
+		POST   /sessions/<id>/rounds  a round (or a list of rounds) in the HistoryIO JSON format, answers the new scores
+		GET    /sessions/<id>/scores  the current emx/fin/eco/pop scores
+		GET    /sessions/<id>/leaderboard?factor=pop&k=10&team=<team>  the top k teams in a factor, and the rank and percentile of a team
+		GET    /sessions/<id>/events  Server-Sent Events stream of the scores after every round
+		DELETE /sessions/<id>         forget the session
+
+	Rounds are folded into the scores on an executor, so the event loop keeps serving other sessions meanwhile. A session is kept once a round was added to it, so rejected rounds and streams of a game that never started leave nothing behind.'''
+
+	def __init__(self, executor: Executor = None, max_body: int = MAX_BODY):
+		self.executor = executor
+		self.max_body = max_body
+		self.sessions = dict()
+		self.server = None
+
+	async def start(self, host: str = "127.0.0.1", port: int = 8080):
+		self.server = await asyncio.start_server(self._handle, host, port)
+
+		return self.server
+
+	def get_port(self) -> int:
+		return self.server.sockets[0].getsockname()[1]
+
+	async def close(self):
+		if self.server is not None:
+			self.server.close()
+			await self.server.wait_closed()
+
+		for session in self.sessions.values():
+			session.publish(None)
+
+	def _acquire(self, session_id) -> Session:
+		'''Get a session for a request or stream, a new one is created.'''
+
+		session = self.sessions.get(session_id)
+
+		if session is None:
+			session = self.sessions[session_id] = Session()
+
+		session.users += 1
+
+		return session
+
+	def _release(self, session_id, session):
+		session.users -= 1
+
+		if session.users == 0 and session.scorer.num_rounds == 0 and self.sessions.get(session_id) is session:
+			del self.sessions[session_id]
+
+	async def add_rounds(self, session_id, rounds) -> dict:
+		'''Fold rounds given in the HistoryIO JSON format into a session and push the new scores to its subscribers. The rounds are added all or none.'''
+
+		rounds = [decode_round(r) for r in rounds]
+		session = self._acquire(session_id)
+
+		def add():
+			scorer = session.scorer
+			teams = scorer.get_round_teams(rounds[0]) if rounds else scorer.teams
+
+			#every round is cleared before the first one is folded in, so an invalid round leaves the scores as they were
+			terms = [get_round_terms(r, teams) for r in rounds]
+
+			for t in terms:
+				scorer.add_terms(t, teams)
+
+			return session.get_scores()
+
+		try:
+			async with session.lock:
+				scores = await asyncio.get_running_loop().run_in_executor(self.executor, add)
+
+				#updated on the event loop, where the leaderboard is read
+				session.leaderboard.update_all(scores["scores"])
+
+		finally:
+			self._release(session_id, session)
+
+		session.publish(scores)
+
+		return scores
+
+	async def _handle(self, reader, writer):
+		try:
+			request_line = (await reader.readline()).decode("latin-1").split()
+			headers = dict()
+
+			while True:
+				line = (await reader.readline()).decode("latin-1").strip()
+
+				if not line:
+					break
+
+				name, _, value = line.partition(":")
+				headers[name.strip().lower()] = value.strip()
+
+			try:
+				length = int(headers.get("content-length", 0))
+
+			except ValueError:
+				length = -1
+
+			if len(request_line) < 2 or length < 0:
+				await self._respond(writer, 400, {"error": "malformed request"})
+				return
+
+			if length > self.max_body:
+				await self._respond(writer, 413, {"error": f"the body is limited to {self.max_body} bytes"})
+				return
+
+			body = await reader.readexactly(length)
+
+			url = urlsplit(request_line[1])
+
+			await self._route(writer, request_line[0].upper(), url.path, body, {k: v[-1] for k, v in parse_qs(url.query).items()})
+
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+
+		finally:
+			writer.close()
+
+	async def _route(self, writer, method, path, body, query = None):
+		parts = [p for p in path.split("/") if p]
+
+		if len(parts) < 2 or parts[0] != "sessions":
+			await self._respond(writer, 404, {"error": "not found"})
+			return
+
+		session_id = parts[1]
+		action = parts[2] if len(parts) > 2 else None
+
+		if action is None and method == "DELETE":
+			session = self.sessions.pop(session_id, None)
+
+			if session is not None:
+				session.publish(None)
+
+			await self._respond(writer, 200, {"deleted": session is not None})
+
+		elif action == "rounds" and method == "POST":
+			try:
+				rounds = json.loads(body)
+				scores = await self.add_rounds(session_id, rounds if isinstance(rounds, list) else [rounds])
+
+			except (ValueError, KeyError, TypeError, AttributeError) as e:
+				await self._respond(writer, 400, {"error": f"invalid round: {e!r}"})
+				return
+
+			await self._respond(writer, 200, scores)
+
+		elif action == "scores" and method == "GET":
+			if session_id not in self.sessions:
+				await self._respond(writer, 404, {"error": "unknown session"})
+				return
+
+			await self._respond(writer, 200, self.sessions[session_id].get_scores())
+
+		elif action == "leaderboard" and method == "GET":
+			if session_id not in self.sessions:
+				await self._respond(writer, 404, {"error": "unknown session"})
+				return
+
+			query = query or dict()
+			session = self.sessions[session_id]
+			factor = query.get("factor", "pop")
+			team = query.get("team")
+
+			try:
+				k = int(query.get("k", 10))
+
+			except ValueError:
+				k = None
+
+			if factor not in FACTORS or k is None or (team is not None and team not in session.leaderboard):
+				await self._respond(writer, 400, {"error": "invalid leaderboard query"})
+				return
+
+			await self._respond(writer, 200, session.get_leaderboard(factor, k, team))
+
+		elif action == "events" and method == "GET":
+			session = self._acquire(session_id)
+
+			try:
+				await self._stream(writer, session)
+
+			finally:
+				self._release(session_id, session)
+
+		else:
+			await self._respond(writer, 405 if action in (None, "rounds", "scores", "leaderboard", "events") else 404, {"error": "not allowed"})
+
+	async def _respond(self, writer, status, payload):
+		body = json.dumps(payload).encode()
+
+		writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+		await writer.drain()
+
+	async def _stream(self, writer, session):
+		queue = asyncio.Queue()
+		session.subscribers.add(queue)
+
+		try:
+			writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+
+			if session.scorer.num_rounds:
+				queue.put_nowait(session.get_scores())
+
+			while True:
+				scores = await queue.get()
+
+				if scores is None: #the session or the service was closed
+					break
+
+				writer.write(f"data: {json.dumps(scores)}\n\n".encode())
+				await writer.drain()
+
+		finally:
+			session.subscribers.discard(queue)
+
+async def serve(host: str, port: int):
+	service = ScoringService()
+	server = await service.start(host, port)
+
+	async with server:
+		await server.serve_forever()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Serve live scores of running games over HTTP.")
+	parser.add_argument("--host", default = "127.0.0.1")
+	parser.add_argument("--port", type = int, default = 8080)
+
+	args = parser.parse_args()
+
+	asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,169 @@
+from Scoring import get_round_terms, get_total_scores
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import List
+import numpy as np
+import threading
+import time
+
+#sequence counter (odd while a round is being written), rounds written, teams, round capacity
+HEADER_DTYPE = np.dtype([("sequence", np.uint64), ("rounds", np.int64), ("teams", np.int64), ("capacity", np.int64)])
+
+NAME_DTYPE = np.dtype("S64") #team names, utf-8
+
+_attach_lock = threading.Lock() #attaching patches the resource tracker of the process
+
+FIELDS = ["consumption", "production", "co2", "expenses", "balance"]
+
+def get_size(teams: int, capacity: int) -> int:
+	return HEADER_DTYPE.itemsize + teams * NAME_DTYPE.itemsize + len(FIELDS) * teams * capacity * np.dtype(np.float64).itemsize
+
+class SharedGame:
+	'''Aggregates of a live game in a shared memory segment, so every worker process on the host scores it without receiving the history.
+
+	The segment holds a header, the team names and a (fields x teams x rounds) float64 array of the consumption, production, CO2, expenses and balance of every team in every round. Writers take the lock and bump the sequence counter around every round, readers work on views of the segment and retry when the counter moved (a seqlock), so they never block a writer.'''
+
+	def __init__(self, memory: shared_memory.SharedMemory, lock = None):
+		self.memory = memory
+		self.lock = lock if lock is not None else threading.Lock() #share a multiprocessing.Lock between the writing processes
+
+		self.header = np.ndarray((), dtype = HEADER_DTYPE, buffer = memory.buf)
+
+		teams = int(self.header["teams"])
+		capacity = int(self.header["capacity"])
+
+		names = np.ndarray(teams, dtype = NAME_DTYPE, buffer = memory.buf, offset = HEADER_DTYPE.itemsize)
+		self.teams = [n.decode() for n in names.tolist()]
+
+		self.data = np.ndarray((len(FIELDS), teams, capacity), dtype = np.float64, buffer = memory.buf, offset = HEADER_DTYPE.itemsize + names.nbytes)
+
+		for idx, field in enumerate(FIELDS):
+			setattr(self, field, self.data[idx])
+
+	@classmethod
+	def create(cls, teams: List[str], capacity: int, name: str = None, lock = None) -> "SharedGame":
+		'''Allocate the segment of a game of teams for at most capacity rounds.'''
+
+		names = [t.encode() for t in teams]
+
+		for team, encoded in zip(teams, names):
+			if len(encoded) > NAME_DTYPE.itemsize:
+				raise ValueError(f"team names are limited to {NAME_DTYPE.itemsize} bytes in utf-8, got {team!r}")
+
+		memory = shared_memory.SharedMemory(name = name, create = True, size = get_size(len(teams), capacity))
+
+		try:
+			header = np.ndarray((), dtype = HEADER_DTYPE, buffer = memory.buf)
+			header["sequence"] = 0
+			header["rounds"] = 0
+			header["teams"] = len(teams)
+			header["capacity"] = capacity
+
+			np.ndarray(len(teams), dtype = NAME_DTYPE, buffer = memory.buf, offset = HEADER_DTYPE.itemsize)[:] = names
+
+			return cls(memory, lock)
+
+		except BaseException:
+			header = None #a view of the buffer keeps it from being closed
+			memory.unlink()
+			memory.close()
+			raise
+
+	@classmethod
+	def attach(cls, name: str, lock = None) -> "SharedGame":
+		'''Open the segment of a game created by another process.'''
+
+		try:
+			memory = shared_memory.SharedMemory(name = name, track = False)
+
+		except TypeError: #before Python 3.13 an attached segment is tracked too and unlinked when the process exits, so its registration is skipped
+			with _attach_lock:
+				register = resource_tracker.register
+
+				#only this segment is skipped, other threads keep registering theirs
+				resource_tracker.register = lambda segment, rtype: None if segment.lstrip("/") == name.lstrip("/") else register(segment, rtype)
+
+				try:
+					memory = shared_memory.SharedMemory(name = name)
+
+				finally:
+					resource_tracker.register = register
+
+		return cls(memory, lock)
+
+	@property
+	def name(self) -> str:
+		return self.memory.name
+
+	@property
+	def num_rounds(self) -> int:
+		return int(self.header["rounds"])
+
+	def add_round(self, round_dict):
+		'''Clear a closed round and append its terms, given as {team: {"productions": ..., "total_consumption": ...}}.'''
+
+		terms = get_round_terms(round_dict, self.teams)
+
+		with self.lock:
+			r = int(self.header["rounds"])
+
+			if r >= self.data.shape[2]:
+				raise ValueError(f"the shared game has room for {self.data.shape[2]} rounds")
+
+			self.header["sequence"] += 1
+
+			try:
+				self.data[:, :, r] = terms
+				self.header["rounds"] = r + 1
+
+			finally:
+				self.header["sequence"] += 1
+
+	def read(self, func):
+		'''Call func(rounds) on a consistent state: it reads the views of the first rounds rounds, and is called again if a writer got in between.'''
+
+		while True:
+			sequence = int(self.header["sequence"])
+
+			if sequence % 2:
+				time.sleep(0)
+				continue
+
+			result = func(int(self.header["rounds"]))
+
+			if int(self.header["sequence"]) == sequence:
+				return result
+
+	def get_scores(self) -> dict:
+		'''Get the current scores of every team, like calculate_final_scores on the rounds written so far.'''
+
+		def score(rounds):
+			if rounds == 0:
+				return dict()
+
+			consumption, _, co2, expenses, balance = self.data[:, :, :rounds].sum(axis = 2)
+
+			return get_total_scores(self.teams, rounds, consumption, co2, expenses, balance)
+
+		return self.read(score)
+
+	def close(self):
+		'''Detach this process from the segment.'''
+
+		self.header = self.data = None
+
+		for field in FIELDS:
+			setattr(self, field, None)
+
+		self.memory.close()
+
+	def unlink(self):
+		'''Free the segment, once every process closed it.'''
+
+		self.memory.unlink()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
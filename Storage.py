@@ -0,0 +1,104 @@
+import Scoring
+from MeritOrder import Power
+from Scoring import get_team_stats
+from TimeSeries import Profiles, clear_profiles, get_profile_scores
+
+import numpy as np
+
+STORAGE = [Power.WATER_STORAGE, Power.BATTERY]
+
+#hours a storage can discharge at its full power
+duration = {
+	Power.WATER_STORAGE: 8,
+	Power.BATTERY: 2,
+}
+
+#share of the charged energy that is discharged again
+efficiency = {
+	Power.WATER_STORAGE: 0.75,
+	Power.BATTERY: 0.9,
+}
+
+class StorageSchedule:
+	'''Charging and discharging of the storage of every team, rounds x teams x storage technologies x steps in MW.'''
+
+	def __init__(self, technologies, charge, discharge):
+		self.technologies = technologies
+		self.charge = charge
+		self.discharge = discharge
+
+	def get_output(self) -> np.ndarray:
+		'''Net output of all the storage of a team, rounds x teams x steps, negative while charging.'''
+
+		return np.sum(self.discharge - self.charge, axis = 2)
+
+def get_storage_power(history, technologies = STORAGE) -> np.ndarray:
+	'''Power of every storage technology of every team in every round, rounds x teams x technologies in MW.'''
+
+	codes, volumes = get_team_stats(history).get_padded()
+
+	return np.stack([np.sum(np.where(codes == p.value, volumes, 0.0), axis = -1) for p in technologies], axis = -1)
+
+def schedule_storage(spare: np.ndarray, shortfall: np.ndarray, power: np.ndarray, durations, efficiencies, step_hours: float = 1) -> tuple:
+	'''Schedule storage in time order, for all rounds and teams at once.
+
+	spare and shortfall are (... x steps) in MW and power (... x technologies). The storage starts a round empty. In every step it discharges into the shortfall what it holds after the losses, then charges from the spare supply until its energy capacity power * duration is full, both at most at its power. The technologies share the spare supply and the shortfall of a step in their order. Returns the charge and discharge (... x technologies x steps) in MW.'''
+
+	steps = spare.shape[-1]
+
+	efficiencies = np.asarray(efficiencies, dtype = float)
+	capacity = power * np.asarray(durations, dtype = float) / step_hours #MW steps
+
+	charge = np.zeros(power.shape + (steps,))
+	discharge = np.zeros(power.shape + (steps,))
+	stored = np.zeros(power.shape) #charged energy held, MW steps
+
+	#a step depends on the state of charge the steps before left, so the steps are a loop over batches of all rounds and teams
+	for t in range(steps):
+		available = spare[..., t]
+		missing = shortfall[..., t]
+
+		for k in range(power.shape[-1]):
+			discharged = np.minimum(np.minimum(power[..., k], stored[..., k] * efficiencies[k]), missing)
+			stored[..., k] = np.maximum(stored[..., k] - discharged / efficiencies[k], 0.0)
+			missing = missing - discharged
+
+			charged = np.minimum(np.minimum(power[..., k], np.maximum(capacity[..., k] - stored[..., k], 0.0)), available)
+			stored[..., k] += charged
+			available = available - charged
+
+			charge[..., k, t] = charged
+			discharge[..., k, t] = discharged
+
+	return charge, discharge
+
+def clear_with_storage(history, prices = None, profiles: Profiles = None, step_hours: float = 1) -> tuple:
+	'''Clear a game with profiles where WATER_STORAGE and BATTERY are scheduled storage instead of fixed producers.
+
+	The game is first cleared without the storage, the storage is then scheduled on that clearing and the game is cleared again with the storage serving and adding demand. The storage only charges from the free surplus (supply that costs nothing and emits no CO2), and only charges and discharges in steps whose balance is already lost (an imbalance above the cutoff), into at most their shortfall. So the balance, expenses and CO2 of a team are never worse than without the storage. Returns the ProfileDispatch and the StorageSchedule.'''
+
+	profiles = Profiles.from_history(history) if profiles is None else profiles
+	profiles = profiles.without(STORAGE)
+
+	before = clear_profiles(history, prices, profiles)
+	cutoff = Scoring.BALANCE_CUTOFF_PERCENT * 0.01 * profiles.demand
+
+	charge, discharge = schedule_storage(
+		np.where(before.surplus > cutoff, before.free_surplus, 0.0),
+		np.where(before.shortfall > cutoff, before.shortfall, 0.0),
+		get_storage_power(history),
+		[duration[p] for p in STORAGE],
+		[efficiency[p] for p in STORAGE],
+		step_hours,
+	)
+
+	schedule = StorageSchedule(STORAGE, charge, discharge)
+
+	return clear_profiles(history, prices, profiles, storage = schedule.get_output()), schedule
+
+def calculate_storage_scores(history, prices = None, profiles: Profiles = None) -> dict:
+	'''Score a game with scheduled storage, in the format of calculate_final_scores.'''
+
+	dispatch, _ = clear_with_storage(history, prices, profiles)
+
+	return get_profile_scores(dispatch, prices)
@@ -0,0 +1,180 @@
+from MeritOrder import Power, as_productions, get_table
+
+import numpy as np
+import contextlib
+import threading
+import json
+import os
+
+POWERPLANTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "powerplants.json")
+
+#a unit of the supply stack, the volume is NaN when the source file does not give one
+UNIT_DTYPE = np.dtype([("price", np.float64), ("volume", np.float64), ("source", "U16")])
+
+def parse_units(path = POWERPLANTS_PATH) -> np.ndarray:
+	'''Parse the string-typed per-unit stack of e.g. powerplants.json into a UNIT_DTYPE array.'''
+
+	with open(path, "r") as f:
+		data = json.load(f)
+
+	units = [(unit["price"], unit.get("volume", "nan"), source) for source, stack in data.items() for unit in stack]
+
+	return np.array(units, dtype = UNIT_DTYPE)
+
+def get_cache_path(path) -> str:
+	return path + ".npy"
+
+#the cache ends with the modification time and the size of the source it was parsed from
+STAMP_DTYPE = np.dtype([("mtime_ns", "<i8"), ("size", "<i8")])
+
+def _get_stamp(path) -> bytes:
+	stat = os.stat(path)
+
+	return np.array((stat.st_mtime_ns, stat.st_size), dtype = STAMP_DTYPE).tobytes()
+
+def _is_fresh(cache_path, stamp) -> bool:
+	'''Whether the cache was parsed from the source as it is now. The stamps are compared for equality, as a restored source can be older than its cache.'''
+
+	try:
+		with open(cache_path, "rb") as f:
+			f.seek(-STAMP_DTYPE.itemsize, os.SEEK_END)
+
+			return f.read() == stamp
+
+	except OSError:
+		return False
+
+def _write_cache(units, cache_path, stamp):
+	'''Write the cache atomically, so a concurrently starting worker never maps a half written file.'''
+
+	#unique per thread, and created with the umask applied so workers of other users can read the cache (tempfile creates private files)
+	temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+	try:
+		with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666), "wb") as f:
+			np.save(f, units)
+			f.write(stamp) #np.load reads the array only, it ignores the bytes after it
+
+		os.replace(temp_path, cache_path)
+
+	except OSError:
+		pass #the cache is only an optimization, e.g. the directory may be read only
+
+	finally:
+		#left over when writing or renaming failed
+		with contextlib.suppress(OSError):
+			os.remove(temp_path)
+
+def load_units(path = POWERPLANTS_PATH, cache: bool = True) -> np.ndarray:
+	'''Get the units of a supply stack file. The parsed units are kept in a binary .npy cache next to it, which is memory-mapped as long as the source file has the modification time and size it was parsed from.'''
+
+	cache_path = get_cache_path(path)
+	stamp = _get_stamp(path) #taken before parsing, a source changed meanwhile makes the cache stale
+
+	if cache and _is_fresh(cache_path, stamp):
+		try:
+			return np.load(cache_path, mmap_mode = "r")
+
+		except (OSError, ValueError):
+			pass #unreadable or corrupt, it is rebuilt below
+
+	units = parse_units(path)
+
+	if cache:
+		_write_cache(units, cache_path, stamp)
+
+	return units
+
+class SupplyCurve:
+	'''Merit order of the whole market. The units are sorted by price once and indexed by the prefix sums of their volumes and costs, so clearing any demand is a single binary search.'''
+
+	def __init__(self, prices, volumes, sources):
+		prices = np.asarray(prices, dtype = float)
+		order = np.argsort(prices, kind = "stable")
+
+		self.prices = prices[order]
+		self.volumes = np.asarray(volumes, dtype = float)[order]
+		self.sources = np.asarray(sources, dtype = str)[order]
+
+		self.supply = np.cumsum(self.volumes) #MW available up to and including each unit
+		self.costs = np.cumsum(self.volumes * self.prices) #EUR of running every unit up to and including it
+
+		#indexed by the marginal unit: supply and cost before it, and its price (0 past the end, when the demand is not covered)
+		self._supply = np.concatenate([[0.0], self.supply])
+		self._costs = np.concatenate([[0.0], self.costs])
+		self._prices = np.concatenate([self.prices, [0.0]])
+
+	@classmethod
+	def from_units(cls, units, default_volumes: dict[str, float] = None):
+		'''Build the curve from a UNIT_DTYPE array. Units without a volume (nuclear, oze) get default_volumes[source] or 0 MW.'''
+
+		volumes = np.array(units["volume"], dtype = float)
+		missing = np.isnan(volumes)
+
+		for source, volume in (default_volumes or dict()).items():
+			volumes[missing & (units["source"] == source)] = volume
+
+		volumes[np.isnan(volumes)] = 0.0
+
+		return cls(units["price"], volumes, units["source"])
+
+	@classmethod
+	def from_json(cls, path = POWERPLANTS_PATH, default_volumes: dict[str, float] = None):
+		'''Parse the per-unit supply stack, e.g. powerplants.json.'''
+
+		return cls.from_units(parse_units(path), default_volumes)
+
+	@classmethod
+	def load(cls, path = POWERPLANTS_PATH, default_volumes: dict[str, float] = None, cache: bool = True):
+		'''Like from_json, but through the binary cache of load_units.'''
+
+		return cls.from_units(load_units(path, cache), default_volumes)
+
+	def __len__(self):
+		return len(self.prices)
+
+	def get_total_supply(self) -> float:
+		return float(self.supply[-1]) if len(self) else 0.0
+
+	def get_clearing(self, demand):
+		'''Get the clearing price, the index of the marginal unit and the dispatched cost for a demand, or an array of demands.
+
+		Like MeritOrder, a demand that the whole stack cannot cover has a price of 0, marginal unit len(self) and every unit dispatched.'''
+
+		demand = np.asarray(demand, dtype = float)
+
+		marginal = np.searchsorted(self.supply, demand, side = "left")
+		price = self._prices[marginal]
+
+		cost = self._costs[marginal] + (demand - self._supply[marginal]) * price
+
+		return price, marginal, cost
+
+	def get_price(self, demand):
+		'''Get the clearing price in EUR/MWh for a demand.'''
+
+		return self.get_clearing(demand)[0]
+
+	def get_cost(self, demand):
+		'''Get the total operating cost in EUR of the units dispatched for a demand.'''
+
+		return self.get_clearing(demand)[2]
+
+	def merge(self, productions, prices) -> "SupplyCurve":
+		'''Get a new curve with a team's powerplants bidding into this stack at the prices of their technologies.'''
+
+		productions = as_productions(productions)
+
+		unit_prices = get_table(prices)[productions["power"]]
+		sources = [Power(int(p)).name for p in productions["power"]]
+
+		return SupplyCurve(
+			np.concatenate([self.prices, unit_prices]),
+			np.concatenate([self.volumes, productions["volume"]]),
+			np.concatenate([self.sources, np.asarray(sources, dtype = str)]),
+		)
+
+	def clear_portfolio(self, productions, total_consumption, prices):
+		'''Clear a team's consumption against this stack together with the team's own powerplants, returns (price, marginal, cost).'''
+
+		return self.merge(productions, prices).get_clearing(total_consumption)
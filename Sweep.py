@@ -0,0 +1,87 @@
+import MeritOrder
+import Scoring
+from MeritOrder import clear_batch, get_table
+from Scoring import building_popularity, combine_scores, ecology_score, finances_score, get_balance_matrix, get_team_stats, get_teams
+
+from typing import List
+import numpy as np
+
+def get_tables(tables, default) -> np.ndarray:
+	'''Stack a list of per-technology dicts or tables into a (tables x technologies) array, None is the single default table.'''
+
+	if tables is None:
+		tables = [default]
+
+	if isinstance(tables, dict):
+		tables = [tables]
+
+	return np.stack([get_table(t) for t in tables])
+
+class SweepResult:
+	'''Scores of every team under every combination of the swept tables.
+
+	emx, fin, eco and pop are (price tables x CO2 tables x derating tables x teams) arrays. stability is the grid stability of every market, (price tables x derating tables x rounds x teams), as the derating tables only change it and not the scores.'''
+
+	def __init__(self, teams, emx, fin, eco, pop, stability):
+		self.teams = teams
+		self.emx = emx
+		self.fin = fin
+		self.eco = eco
+		self.pop = pop
+		self.stability = stability
+
+	@property
+	def shape(self):
+		return self.pop.shape[:-1]
+
+	def get_scores(self, price: int = 0, co2: int = 0, derating: int = 0) -> dict:
+		'''Get the scores at one grid point in the format of calculate_final_scores.'''
+
+		point = (price, co2, derating)
+
+		return {
+			t: {"emx": self.emx[point][idx], "fin": self.fin[point][idx], "eco": self.eco[point][idx], "pop": self.pop[point][idx]}
+			for idx, t in enumerate(self.teams)
+		}
+
+def sweep(history, price_tables: List = None, co2_tables: List = None, derating_tables: List = None) -> SweepResult:
+	'''Score a fixed game history under every combination of price, CO2 and derating tables in one vectorized pass.
+
+	The tables are per-technology dicts or arrays like Scoring.prices; None keeps the current table. Every round is cleared once per price table, in one batch over (price tables x rounds x teams). The CO2 tables are applied to the dispatched volume per technology, so they cost no extra clearing, and a CO2 table is also the worst case of the ecology score like Scoring.co2eq.'''
+
+	game = get_team_stats(history)
+	teams = get_teams(game)
+	num_rounds = len(game)
+
+	price_tables = get_tables(price_tables, Scoring.prices)
+	co2_tables = get_tables(co2_tables, Scoring.co2eq)
+	derating_tables = get_tables(derating_tables, MeritOrder.derating)
+
+	codes, volumes = game.get_padded()
+	consumptions = game.consumptions
+	total_cons = consumptions.sum(axis = 0)
+
+	dispatch = clear_batch(price_tables, codes, volumes, consumptions)
+
+	mix = dispatch.get_mix() #price tables x rounds x teams x technologies
+	expenses = dispatch.expenses.sum(axis = 1)
+	co2 = np.moveaxis(mix.sum(axis = 1) @ co2_tables.T, -1, 1)
+
+	weighted = np.moveaxis(mix @ derating_tables.T, -1, 1)
+	stability = np.divide(weighted, consumptions, out = np.full(weighted.shape, 100.0), where = consumptions > 0)
+
+	#the balance and the popularity only depend on the history
+	emx = get_balance_matrix(consumptions, game.get_production_sums(), num_rounds)[1] * 100
+	fin = finances_score(expenses, total_cons, price_tables[:, np.newaxis])
+	eco = ecology_score(co2, total_cons, co2_tables[:, np.newaxis])
+
+	shape = (len(price_tables), len(co2_tables), len(derating_tables), len(teams))
+
+	scores = combine_scores(
+		np.broadcast_to(emx, shape),
+		np.broadcast_to(fin[:, np.newaxis, np.newaxis], shape),
+		np.broadcast_to(eco[:, :, np.newaxis], shape),
+		building_popularity(total_cons),
+	)
+
+	return SweepResult(teams, scores["emx"], scores["fin"], scores["eco"], scores["pop"], stability)
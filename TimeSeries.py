@@ -0,0 +1,170 @@
+import Scoring
+from GameHistory import GameHistory
+from MeritOrder import CO2EQ, PADDING, Power, clear_batch, get_power_code, get_table, sort_batch
+from Scoring import building_popularity, combine_scores, ecology_score, finances_score, get_round_balance, get_team_stats, get_teams
+
+import numpy as np
+
+class Profiles:
+	'''Time series of the rounds of a game: the demand of every team in every step, and the availability of the technologies that have a profile.
+
+	A team's round can carry a "load_profile" (MW per step) and an "availability" dict {technology: factor per step} next to its "productions" and "total_consumption". Without a load profile the demand is total_consumption in every step, and a technology without an availability profile offers its full volume.'''
+
+	def __init__(self, demand, availability, technologies):
+		self.demand = demand #rounds x teams x steps
+		self.availability = availability #rounds x teams x profiled technologies x steps
+		self.technologies = technologies #codes of the profiled technologies
+
+	@property
+	def steps(self) -> int:
+		return self.demand.shape[-1]
+
+	@classmethod
+	def from_history(cls, history, steps: int = None):
+		'''Collect the profiles of a game given as a list of round dicts. All profiles of a game have the same number of steps, a GameHistory has none and is a single step.'''
+
+		game = get_team_stats(history)
+		teams = get_teams(game)
+		rounds = [] if isinstance(history, GameHistory) else history
+
+		profiles = [(r, t, stats) for r, round_dict in enumerate(rounds) for t, stats in enumerate(round_dict[team] for team in teams)]
+
+		technologies = sorted({get_power_code(p) for _, _, stats in profiles for p in stats.get("availability", dict())})
+		lengths = {len(stats["load_profile"]) for _, _, stats in profiles if "load_profile" in stats}
+		lengths |= {len(a) for _, _, stats in profiles for a in stats.get("availability", dict()).values()}
+
+		if steps is not None:
+			lengths.add(steps)
+
+		if len(lengths) > 1:
+			raise ValueError(f"the profiles of a game must have the same number of steps, got {sorted(lengths)}")
+
+		steps = lengths.pop() if lengths else 1
+		slots = {code: slot for slot, code in enumerate(technologies)}
+
+		demand = np.repeat(game.consumptions[..., np.newaxis], steps, axis = -1)
+		availability = np.ones(game.consumptions.shape + (len(technologies), steps))
+
+		for r, t, stats in profiles:
+			if "load_profile" in stats:
+				demand[r, t] = stats["load_profile"]
+
+			for power, profile in stats.get("availability", dict()).items():
+				availability[r, t, slots[get_power_code(power)]] = profile
+
+		return cls(demand, availability, np.array(technologies, dtype = np.intp))
+
+	def without(self, technologies) -> "Profiles":
+		'''Get the profiles with the given technologies unavailable in every step, e.g. storage that is dispatched separately.'''
+
+		codes = sorted(set(self.technologies.tolist()) | {get_power_code(p) for p in technologies})
+		slots = {code: slot for slot, code in enumerate(codes)}
+
+		availability = np.ones(self.demand.shape[:2] + (len(codes), self.steps))
+		availability[:, :, [slots[c] for c in self.technologies.tolist()]] = self.availability
+		availability[:, :, [slots[get_power_code(p)] for p in technologies]] = 0.0
+
+		return Profiles(self.demand, availability, np.array(codes, dtype = np.intp))
+
+	def get_factors(self, codes: np.ndarray, steps: slice) -> np.ndarray:
+		'''Availability of every plant of a padded rounds x teams x plants batch in the given steps, rounds x teams x plants x steps.'''
+
+		#the technologies without a profile and the padding (code -1) read an extra slot of ones
+		slots = np.full(len(Power) + 1, len(self.technologies), dtype = np.intp)
+		slots[self.technologies] = np.arange(len(self.technologies))
+
+		availability = self.availability[..., steps]
+		availability = np.concatenate([availability, np.ones(availability.shape[:2] + (1,) + availability.shape[3:])], axis = 2)
+
+		return np.take_along_axis(availability, slots[codes][..., np.newaxis], axis = 2)
+
+class ProfileDispatch:
+	'''Result of clearing every step of every round. price, shortfall (the demand not covered) and surplus (the supply left over) are rounds x teams x steps, and so is free_surplus, the part of the surplus that is next in merit order and costs nothing and emits no CO2; co2, expenses, consumption and balance are the means over the steps of a round, rounds x teams, so a constant profile gives the values of the scalar round.'''
+
+	def __init__(self, teams, price, shortfall, surplus, free_surplus, co2, expenses, consumption, balance):
+		self.teams = teams
+		self.price = price
+		self.shortfall = shortfall
+		self.surplus = surplus
+		self.free_surplus = free_surplus
+		self.co2 = co2
+		self.expenses = expenses
+		self.consumption = consumption
+		self.balance = balance
+
+def clear_profiles(history, prices = None, profiles: Profiles = None, chunksize: int = 168, storage: np.ndarray = None) -> ProfileDispatch:
+	'''Clear every team in every step of every round against its demand profile, with the volumes scaled by the availability profiles.
+
+	storage is the net output of scheduled storage (discharging positive, charging negative) per round, team and step. It serves the demand before the merit order does and counts as production in the balance.
+
+	The steps are cleared chunksize at a time, each chunk in one (steps x rounds x teams) batch, so a long profile does not need all its markets in memory at once.'''
+
+	game = get_team_stats(history)
+	teams = get_teams(game)
+
+	profiles = Profiles.from_history(history) if profiles is None else profiles
+	price_table = get_table(Scoring.prices if prices is None else prices)
+
+	codes, volumes = game.get_padded()
+	steps = profiles.steps
+
+	price = np.empty(profiles.demand.shape)
+	shortfall = np.empty(profiles.demand.shape)
+	surplus = np.empty(profiles.demand.shape)
+	free_surplus = np.empty(profiles.demand.shape)
+	co2 = np.zeros(game.consumptions.shape)
+	expenses = np.zeros(game.consumptions.shape)
+	balance = np.zeros(game.consumptions.shape)
+
+	for start in range(0, steps, chunksize):
+		chunk = slice(start, min(start + chunksize, steps))
+
+		#steps go first, they are the batch axis of clear_batch
+		offered = np.moveaxis(volumes[..., np.newaxis] * profiles.get_factors(codes, chunk), -1, 0)
+		demand = np.moveaxis(profiles.demand[..., chunk], -1, 0)
+		supply = offered.sum(axis = -1)
+		residual = demand
+
+		if storage is not None:
+			stored = np.moveaxis(storage[..., chunk], -1, 0)
+
+			#the merit order serves what storage does not
+			supply = supply + stored
+			residual = np.maximum(demand - stored, 0.0)
+
+		dispatch = clear_batch(price_table, np.broadcast_to(codes, offered.shape), offered, residual)
+		_, sorted_volumes, unit_prices = sort_batch(price_table, np.broadcast_to(codes, offered.shape), offered)
+
+		#more demand is served by the idle plants in merit order, it is free as long as they have no price and no CO2
+		idle = sorted_volumes - dispatch.dispatched
+		free = (dispatch.codes != PADDING) & (unit_prices == 0) & (CO2EQ[np.maximum(dispatch.codes, 0)] == 0)
+		reached = np.cumsum(~free & (idle > 0), axis = -1) == 0
+
+		price[..., chunk] = np.moveaxis(dispatch.price, 0, -1)
+		shortfall[..., chunk] = np.moveaxis(np.maximum(demand - supply, 0.0), 0, -1)
+		surplus[..., chunk] = np.moveaxis(np.maximum(supply - demand, 0.0), 0, -1)
+		free_surplus[..., chunk] = np.moveaxis(np.sum(np.where(free & reached, idle, 0.0), axis = -1), 0, -1)
+		co2 += dispatch.co2.sum(axis = 0)
+		expenses += dispatch.expenses.sum(axis = 0)
+		balance += get_round_balance(demand - supply, Scoring.BALANCE_CUTOFF_PERCENT * 0.01 * demand).sum(axis = 0)
+
+	return ProfileDispatch(teams, price, shortfall, surplus, free_surplus, co2 / steps, expenses / steps, profiles.demand.mean(axis = -1), balance / steps)
+
+def calculate_profile_scores(history, prices = None, profiles: Profiles = None) -> dict:
+	'''Score a game whose rounds carry load and availability profiles, in the format of calculate_final_scores.'''
+
+	return get_profile_scores(clear_profiles(history, prices, profiles), prices)
+
+def get_profile_scores(dispatch: ProfileDispatch, prices = None) -> dict:
+	'''Scores of every team from a cleared game with profiles.'''
+
+	num_rounds = len(dispatch.consumption)
+	total_cons = dispatch.consumption.sum(axis = 0)
+
+	emx = np.sum(dispatch.balance * (1 / num_rounds), axis = 0) * 100
+	fin = finances_score(dispatch.expenses.sum(axis = 0), total_cons, prices)
+	eco = ecology_score(dispatch.co2.sum(axis = 0), total_cons)
+
+	scores = combine_scores(emx, fin, eco, building_popularity(total_cons))
+
+	return {t: {k: v[idx] for k, v in scores.items()} for idx, t in enumerate(dispatch.teams)}
@@ -0,0 +1,212 @@
+from MeritOrder import MeritOrder, Power, dispatch_cache
+import Scoring
+
+from typing import List
+import numpy as np
+import tracemalloc
+import argparse
+import subprocess
+import platform
+import time
+import json
+import sys
+import os
+
+#share of the powerplants of each technology in a generated game
+DEFAULT_MIX = {
+	Power.COAL: 0.2,
+	Power.GAS: 0.2,
+	Power.NUCLEAR: 0.1,
+	Power.WATER: 0.1,
+	Power.WATER_STORAGE: 0.05,
+	Power.WIND: 0.15,
+	Power.PHOTOVOLTAIC: 0.15,
+	Power.BATTERY: 0.05,
+}
+
+def generate_history(teams: int, rounds: int, plants: int, mix: dict[Power, float] = None, seed: int = 0) -> List[dict]:
+	'''Generate a seeded synthetic game in the format of Scoring.calculate_final_scores.
+
+	Every team fields plants powerplants per round drawn from the technology mix, and its consumption is its production +- 10 %, so all the balance branches are hit.'''
+
+	rng = np.random.default_rng(seed)
+
+	mix = mix or DEFAULT_MIX
+	technologies = list(mix.keys())
+	weights = np.array([mix[t] for t in technologies], dtype = float)
+
+	codes = rng.choice(len(technologies), size = (rounds, teams, plants), p = weights / weights.sum())
+	volumes = rng.integers(1, 21, size = (rounds, teams, plants)) * 50.0
+
+	production = volumes.sum(axis = 2)
+	consumptions = np.round(production * rng.choice([0.9, 0.995, 1.0, 1.005, 1.1], size = (rounds, teams)))
+
+	history = []
+
+	for r in range(rounds):
+		history.append({
+			f"Team {t}": {
+				"productions": [(technologies[c], v) for c, v in zip(codes[r, t], volumes[r, t])],
+				"total_consumption": consumptions[r, t],
+			}
+			for t in range(teams)
+		})
+
+	return history
+
+#import time budgets in seconds of the modules short-lived workers and CLI runs import, NumPy included
+IMPORT_BUDGETS = {
+	"MeritOrder": 0.3,
+	"Scoring": 0.3,
+	"HistoryIO": 0.3,
+	"BulkScoring": 0.3,
+}
+
+#modules that must stay out of the scoring core
+HEAVY_MODULES = ["matplotlib", "SampleHistory"]
+
+_IMPORT_PROBE = """
+import time, sys, json
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+def bench_imports(budgets: dict = None, repeat: int = 3) -> dict:
+	'''Import time of every module in a fresh interpreter (best of repeat) against its budget, and the heavy modules it pulled in.'''
+
+	budgets = budgets or IMPORT_BUDGETS
+	results = dict()
+
+	for module, budget in budgets.items():
+		best = float("inf")
+
+		for _ in range(repeat):
+			output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE.format(module = module, heavy = HEAVY_MODULES)], cwd = os.path.dirname(os.path.abspath(__file__)), capture_output = True, text = True, check = True).stdout
+			elapsed, heavy = json.loads(output)
+			best = min(best, elapsed)
+
+		results[module] = {"time": best, "budget": budget, "heavy": heavy, "ok": best <= budget and not heavy}
+
+	return results
+
+def _time(func, repeat, setup = None):
+	'''Best wall time of repeat calls in seconds, the result of setup (not timed) is passed to func.'''
+
+	best = float("inf")
+
+	for _ in range(repeat):
+		args = (setup(),) if setup else ()
+
+		start = time.perf_counter()
+		func(*args)
+		best = min(best, time.perf_counter() - start)
+
+	return best
+
+def _peak_memory(func):
+	'''Peak traced memory of a call in bytes.'''
+
+	tracemalloc.start()
+
+	try:
+		func()
+		return tracemalloc.get_traced_memory()[1]
+
+	finally:
+		tracemalloc.stop()
+
+def bench_merit_order(history, repeat):
+	productions = [r[t]["productions"] for r in history for t in r]
+	consumptions = [r[t]["total_consumption"] for r in history for t in r]
+
+	def construct(reset = True):
+		#an empty dispatch cache makes the first getter clear every market
+		if reset:
+			dispatch_cache.reset()
+
+		return [MeritOrder(Scoring.prices, p, c) for p, c in zip(productions, consumptions)]
+
+	results = {"merit_orders": len(productions), "construct": _time(construct, repeat)}
+
+	for getter in ["getPrice", "getTotalCost", "getTotalProfit", "getTotalExpenses", "getReleasedCO2", "getGridStability"]:
+		call = lambda merit_orders: [getattr(mo, getter)() for mo in merit_orders]
+
+		#the first getter on an instance clears the market, the others read the dispatch of the instance
+		results[getter] = _time(call, repeat, construct)
+
+		#new instances of merit orders already in the dispatch cache
+		call(construct())
+		results[getter + "_dispatch_cache"] = _time(call, repeat, lambda: construct(reset = False))
+
+		merit_orders = construct()
+		call(merit_orders)
+
+		results[getter + "_cached"] = _time(lambda: call(merit_orders), repeat)
+
+	return results
+
+def bench_scoring(history, repeat):
+	return {
+		"get_team_stats": _time(lambda: Scoring.get_team_stats(history), repeat),
+		"clear_history": _time(lambda: Scoring.clear_history(history), repeat),
+		"calculate_final_scores": _time(lambda: Scoring.calculate_final_scores(history), repeat),
+		#score_rounds clears every round through the dispatch cache, emptied before every call or kept warm
+		"score_rounds": _time(lambda _: Scoring.score_rounds(history), repeat, dispatch_cache.reset),
+		"score_rounds_cached": _time(lambda: Scoring.score_rounds(history), repeat),
+		"peak_memory": _peak_memory(lambda: Scoring.calculate_final_scores(history)),
+	}
+
+def run(scales, repeat = 3, seed = 0) -> dict:
+	'''Run the benchmarks for every (teams, rounds, plants) scale.'''
+
+	results = []
+
+	for teams, rounds, plants in scales:
+		history = generate_history(teams, rounds, plants, seed = seed)
+
+		results.append({
+			"teams": teams,
+			"rounds": rounds,
+			"plants": plants,
+			"merit_order": bench_merit_order(history, repeat),
+			"scoring": bench_scoring(history, repeat),
+		})
+
+	return {
+		"python": platform.python_version(),
+		"numpy": np.__version__,
+		"seed": seed,
+		"repeat": repeat,
+		"imports": bench_imports(repeat = repeat),
+		"results": results,
+	}
+
+def _scale(text):
+	return tuple(int(x) for x in text.split("x"))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Benchmark MeritOrder and Scoring on synthetic games.")
+	parser.add_argument("--scale", type = _scale, action = "append", help = "TEAMSxROUNDSxPLANTS, can be repeated (default: 5x10x3 and 50x100x5)")
+	parser.add_argument("--repeat", type = int, default = 3, help = "timing repetitions, the best one is reported")
+	parser.add_argument("--seed", type = int, default = 0)
+	parser.add_argument("--output", help = "write the results as JSON to this file instead of stdout")
+	parser.add_argument("--check-imports", action = "store_true", help = "only measure the imports, exit with 1 when one is over its budget or imports a heavy module")
+
+	args = parser.parse_args()
+
+	if args.check_imports:
+		imports = bench_imports(repeat = args.repeat)
+		print(json.dumps(imports, indent = "\t"))
+
+		sys.exit(0 if all(i["ok"] for i in imports.values()) else 1)
+
+	report = run(args.scale or [(5, 10, 3), (50, 100, 5)], args.repeat, args.seed)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent = "\t")
+
+	else:
+		print(json.dumps(report, indent = "\t"))
@@ -0,0 +1,47 @@
+from GameHistory import GameHistory
+from HistoryIO import append_round, dump_columnar, dump_history, iter_rounds, read_history, write_rounds
+from Scoring import calculate_final_scores, score_rounds
+from benchmark import generate_history
+
+import types
+import pytest
+
+@pytest.fixture
+def history():
+	return generate_history(5, 6, 4, seed = 11)
+
+@pytest.mark.parametrize("codes", [False, True])
+def test_round_log(history, tmp_path, codes):
+	path = str(tmp_path / "game.jsonl")
+	write_rounds(iter(history), path, codes = codes)
+
+	rounds = iter_rounds(path)
+
+	assert isinstance(rounds, types.GeneratorType) #read lazily
+	assert score_rounds(rounds) == calculate_final_scores(history)
+
+def test_append_round(history, tmp_path):
+	path = str(tmp_path / "game.jsonl")
+	write_rounds(history[:2], path)
+
+	for r in history[2:]:
+		append_round(r, path)
+
+	assert calculate_final_scores(list(iter_rounds(path))) == calculate_final_scores(history)
+
+def test_read_history(history, tmp_path):
+	paths = [str(tmp_path / name) for name in ["game.json", "game.jsonl", "game.npz"]]
+
+	dump_history(history, paths[0])
+	write_rounds(history, paths[1])
+	dump_columnar(history, paths[2])
+
+	expected = calculate_final_scores(history)
+
+	assert calculate_final_scores(read_history(paths[0])) == expected
+	assert score_rounds(read_history(paths[1])) == expected #the lazy rounds of the log
+
+	game = read_history(paths[2])
+
+	assert isinstance(game, GameHistory)
+	assert calculate_final_scores(game) == expected
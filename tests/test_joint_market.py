@@ -0,0 +1,62 @@
+from JointMarket import calculate_joint_scores, clear_joint
+from MeritOrder import CO2EQ, MeritOrder, Power, get_table
+from Scoring import BALANCE_CUTOFF_PERCENT, FACTORS, get_round_balance, prices
+from benchmark import generate_history
+
+import numpy as np
+import pytest
+
+def test_matches_merit_orders():
+	history = generate_history(4, 6, 5, seed = 11)
+	dispatch = clear_joint(history)
+
+	teams = list(history[0])
+	price_table = get_table(prices)
+
+	assert dispatch.teams == teams
+
+	for r, round_dict in enumerate(history):
+		#one market over the powerplants of all teams, the owners sorted along like the merit order does
+		productions = [p for t in teams for p in round_dict[t]["productions"]]
+		owners = np.array([idx for idx, t in enumerate(teams) for _ in round_dict[t]["productions"]])
+		consumption = sum(round_dict[t]["total_consumption"] for t in teams)
+
+		merit_order = MeritOrder(prices, productions, consumption)
+		units = merit_order.getUnitDispatch()
+
+		codes = merit_order.sorted_productions["power"]
+		owners = owners[np.argsort(price_table[[Power(p).value for p, _ in productions]], kind = "stable")]
+
+		assert dispatch.price[r] == pytest.approx(merit_order.getPrice())
+
+		np.testing.assert_allclose(dispatch.dispatched[r], np.bincount(owners, units.dispatched, len(teams)))
+		np.testing.assert_allclose(dispatch.revenue[r], dispatch.dispatched[r] * merit_order.getPrice())
+		np.testing.assert_allclose(dispatch.expenses[r], np.bincount(owners, units.dispatched * price_table[codes], len(teams)))
+		np.testing.assert_allclose(dispatch.co2[r], np.bincount(owners, units.dispatched * CO2EQ[codes], len(teams)))
+
+		assert dispatch.expenses[r].sum() == pytest.approx(merit_order.getTotalExpenses())
+		assert dispatch.co2[r].sum() == pytest.approx(merit_order.getReleasedCO2())
+
+	np.testing.assert_allclose(dispatch.profit, dispatch.revenue - dispatch.expenses)
+
+def test_balance():
+	history = [{
+		"A": {"productions": [(Power.NUCLEAR, 300)], "total_consumption": 100},
+		"B": {"productions": [(Power.GAS, 300)], "total_consumption": 150},
+	}]
+
+	dispatch = clear_joint(history)
+
+	#the cheap nuclear plant of A covers both teams, B dispatches nothing
+	np.testing.assert_allclose(dispatch.dispatched, [[250, 0]])
+	np.testing.assert_allclose(dispatch.balance, get_round_balance(np.array([[-150, 150]]), np.array([[100, 150]]) * 0.01 * BALANCE_CUTOFF_PERCENT))
+
+def test_scores():
+	history = generate_history(3, 4, 5, seed = 12)
+	scores = calculate_joint_scores(history)
+
+	assert list(scores) == list(history[0])
+
+	for s in scores.values():
+		assert set(s) == set(FACTORS)
+		assert all(np.isfinite(v) for v in s.values())
@@ -0,0 +1,53 @@
+from Leaderboard import Leaderboard
+from Scoring import FACTORS
+
+import random
+
+def get_scores(pop, **others):
+	return {"emx": 0, "fin": 0, "eco": 0, "pop": pop, **others}
+
+def test_ties():
+	board = Leaderboard()
+	board.update_all({"C": get_scores(50), "A": get_scores(80), "B": get_scores(50), "D": get_scores(10)})
+
+	assert board.get_top("pop") == [("A", 80.0), ("B", 50.0), ("C", 50.0), ("D", 10.0)]
+	assert board.get_top("pop", 2) == [("A", 80.0), ("B", 50.0)]
+	assert [board.get_rank(t, "pop") for t in "ABCD"] == [1, 2, 2, 4]
+	assert [board.get_percentile(t, "pop") for t in "ABCD"] == [100.0, 75.0, 75.0, 25.0]
+
+	#every team ties in the other factors
+	assert {board.get_rank(t, "fin") for t in "ABCD"} == {1}
+
+def test_updated_scores():
+	board = Leaderboard()
+	board.update_all({"A": get_scores(80), "B": get_scores(50)})
+	board.update("B", get_scores(90.004))
+
+	assert board.get_top("pop") == [("B", 90.0), ("A", 80.0)]
+	assert board.get_rank("A", "pop") == 2
+	assert board.get_score("B", "pop") == 90.0
+
+	board.remove("B")
+
+	assert len(board) == 1 and "B" not in board
+	assert board.get_rank("A", "pop") == 1
+	assert board.get_percentile("A", "pop") == 100.0
+
+def test_matches_sorting():
+	rng = random.Random(0)
+	board = Leaderboard()
+	scores = dict()
+
+	for _ in range(500):
+		team = f"T{rng.randrange(40)}"
+		scores[team] = {f: rng.choice([rng.uniform(0, 100), 50.0]) for f in FACTORS}
+		board.update(team, scores[team])
+
+	for factor in FACTORS:
+		rounded = {t: round(s[factor], 2) for t, s in scores.items()}
+
+		assert board.get_top(factor, 5) == sorted(rounded.items(), key = lambda x: (-x[1], x[0]))[:5]
+
+		for team, score in rounded.items():
+			assert board.get_rank(team, factor) == 1 + sum(s > score for s in rounded.values())
+			assert board.get_percentile(team, factor) == 100 * sum(s <= score for s in rounded.values()) / len(rounded)
@@ -0,0 +1,51 @@
+from MeritOrder import MeritOrder, Power
+from MonteCarlo import DEFAULT_UNCERTAINTY, sample_factors, simulate
+from Scoring import calculate_final_scores, prices
+from benchmark import generate_history
+
+import numpy as np
+
+def test_without_uncertainty():
+	history = generate_history(4, 5, 4, seed = 9)
+	result = simulate(history, scenarios = 3, uncertainty = dict())
+
+	teams = list(history[0])
+	scores = calculate_final_scores(history)
+
+	co2 = [sum(MeritOrder(prices, r[t]["productions"], r[t]["total_consumption"]).getReleasedCO2() for r in history) for t in teams]
+	expenses = [sum(MeritOrder(prices, r[t]["productions"], r[t]["total_consumption"]).getTotalExpenses() for r in history) for t in teams]
+
+	for s in range(3):
+		np.testing.assert_allclose(result.co2[s], co2)
+		np.testing.assert_allclose(result.expenses[s], expenses)
+		np.testing.assert_allclose(np.round(result.balance[s], 2), [scores[t]["emx"] for t in teams])
+
+def test_matches_merit_orders():
+	history = generate_history(3, 4, 5, seed = 10)
+	result = simulate(history, scenarios = 5, seed = 2, chunksize = 2)
+
+	teams = list(history[0])
+	factors = sample_factors(DEFAULT_UNCERTAINTY, 5, len(history), np.random.default_rng(2))
+
+	for s in range(5):
+		#every market cleared on its own with the sampled volumes
+		markets = [
+			[MeritOrder(prices, [(p, v * factors[s, r, Power(p).value]) for p, v in round_dict[t]["productions"]], round_dict[t]["total_consumption"]) for t in teams]
+			for r, round_dict in enumerate(history)
+		]
+
+		np.testing.assert_allclose(result.co2[s], np.sum([[m.getReleasedCO2() for m in row] for row in markets], axis = 0))
+		np.testing.assert_allclose(result.expenses[s], np.sum([[m.getTotalExpenses() for m in row] for row in markets], axis = 0))
+
+def test_reproducible():
+	history = generate_history(3, 4, 5, seed = 10)
+
+	a = simulate(history, scenarios = 7, seed = 4, chunksize = 3)
+	b = simulate(history, scenarios = 7, seed = 4, chunksize = 7)
+
+	for metric in a.METRICS:
+		np.testing.assert_allclose(getattr(a, metric), getattr(b, metric))
+
+	summary = a.get_summary()
+
+	assert summary[a.teams[0]]["co2"]["p5"] <= summary[a.teams[0]]["co2"]["p50"] <= summary[a.teams[0]]["co2"]["p95"]
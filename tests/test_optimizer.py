@@ -0,0 +1,44 @@
+from MeritOrder import Power
+from Optimizer import PortfolioSearch, evaluate_portfolios, optimize_portfolio
+from Scoring import FACTORS, calculate_final_scores
+
+import numpy as np
+
+CONSUMPTIONS = [1600, 1800, 2100, 1900]
+
+def test_evaluate_matches_final_scores():
+	rng = np.random.default_rng(3)
+	portfolios = np.where(rng.random((20, len(Power))) < 0.5, 0.0, rng.integers(1, 12, (20, len(Power))) * 100.0)
+	portfolios[0] = 0.0 #no plant at all
+
+	scores = evaluate_portfolios(portfolios, CONSUMPTIONS)
+
+	for idx, portfolio in enumerate(portfolios):
+		productions = [(p, portfolio[p.value]) for p in Power if portfolio[p.value] > 0]
+		expected = calculate_final_scores([{"A": {"productions": productions, "total_consumption": c}} for c in CONSUMPTIONS])["A"]
+
+		assert {f: round(float(scores[f][idx]), 2) for f in FACTORS} == expected
+
+def test_project():
+	costs = {p: 1.0 + p.value for p in Power}
+	search = PortfolioSearch(CONSUMPTIONS, capacity = {p: 500 for p in Power}, costs = costs, budget = 3000, step = 50)
+
+	rng = np.random.default_rng(0)
+	portfolios = search.project(rng.uniform(-100, 1000, (200, len(Power))))
+
+	assert np.all(portfolios >= 0)
+	assert np.all(portfolios <= 500)
+	assert np.all(portfolios @ search.costs <= 3000 + 1e-6)
+	np.testing.assert_allclose(portfolios / 50, np.round(portfolios / 50), atol = 1e-9)
+
+def test_optimize_portfolio():
+	top = optimize_portfolio(CONSUMPTIONS, time_budget = 0.05, k = 3)
+
+	assert len(top) == 3
+	assert [t["scores"]["pop"] for t in top] == sorted((t["scores"]["pop"] for t in top), reverse = True)
+
+	#the best portfolio scores like calculate_final_scores says
+	best = top[0]
+	history = [{"A": {"productions": list(best["portfolio"].items()), "total_consumption": c}} for c in CONSUMPTIONS]
+
+	assert calculate_final_scores(history)["A"] == best["scores"]
@@ -0,0 +1,31 @@
+from MeritOrder import MeritOrder, Power
+from SampleHistory import history
+from Scoring import calculate_final_scores, prices
+
+import Profiling
+
+def test_disabled_records_nothing():
+	Profiling.reset()
+	calculate_final_scores(history)
+
+	assert Profiling.get_report() == dict()
+
+def test_profile_stages():
+	with Profiling.profile():
+		calculate_final_scores(history)
+
+	report = Profiling.get_report()
+
+	assert report["Scoring.calculate_final_scores"]["calls"] == 1
+	assert report["MeritOrder.clear_batch"]["calls"] >= 1
+	assert set(report["Scoring.clear_history"]) == {"calls", "time", "max_time", "net_blocks"}
+	assert not Profiling.is_enabled()
+
+def test_getters_not_wrapped():
+	#a getter reads the dispatch of its instance, a profiling wrapper would cost more than the getter itself
+	assert not hasattr(MeritOrder.getPrice, "__wrapped__")
+
+	with Profiling.profile():
+		MeritOrder(prices, [(Power.COAL, 100)], 50).getPrice()
+
+	assert "MeritOrder.MeritOrder.getPrice" not in Profiling.get_report()
@@ -0,0 +1,72 @@
+from HistoryIO import dump_columnar, dump_history, write_rounds
+from ScoreGames import get_plot_names, main
+from Scoring import FACTORS, calculate_final_scores
+from benchmark import generate_history
+
+import numpy as np
+import json
+import csv
+import os
+import pytest
+
+@pytest.fixture
+def games(tmp_path):
+	'''Games in every history format, in two directories, as {path: history}.'''
+
+	histories = [generate_history(3, 4, 3, seed = seed) for seed in range(4)]
+	paths = [tmp_path / "a" / "game.json", tmp_path / "b" / "game.json", tmp_path / "b" / "log.jsonl", tmp_path / "b" / "store.npz"]
+
+	for path in paths:
+		path.parent.mkdir(exist_ok = True)
+
+	dump_history(histories[0], str(paths[0]))
+	dump_history(histories[1], str(paths[1]))
+	write_rounds(histories[2], str(paths[2]))
+	dump_columnar(histories[3], str(paths[3]))
+
+	return {str(p): h for p, h in zip(paths, histories)}
+
+def get_expected(games):
+	return {path: {t: {f: float(s[f]) for f in FACTORS} for t, s in calculate_final_scores(h).items()} for path, h in games.items()}
+
+def test_csv(games, capsys):
+	main(list(games) + ["-p", "1"])
+
+	rows = list(csv.DictReader(capsys.readouterr().out.splitlines()))
+	scores = dict()
+
+	for row in rows:
+		scores.setdefault(row["game"], dict())[row["team"]] = {f: float(row[f]) for f in FACTORS}
+
+	assert scores == get_expected(games)
+
+def test_json(games, tmp_path):
+	output = str(tmp_path / "scores.json")
+	main(list(games) + ["-p", "1", "-o", output])
+
+	with open(output) as f:
+		assert json.load(f) == get_expected(games)
+
+def test_npz(games, tmp_path):
+	output = str(tmp_path / "scores.npz")
+	main([str(tmp_path / "b"), "-p", "1", "-o", output])
+
+	expected = get_expected({p: h for p, h in games.items() if os.sep + "b" + os.sep in p})
+	columns = np.load(output)
+
+	assert len(columns["game"]) == sum(len(s) for s in expected.values())
+
+	for idx, (game, team) in enumerate(zip(columns["game"], columns["team"])):
+		assert {f: float(columns[f][idx]) for f in FACTORS} == expected[game][team]
+
+def test_plot_names():
+	assert get_plot_names(["a/game.json", "b/game.json", "b/log.jsonl", "b/log.npz", "a/game.json"]) == ["a/game", "b/game", "b/log.jsonl", "b/log.npz", "a/game"]
+	assert get_plot_names(["games/one.json", "games/two.npz"]) == ["one", "two"]
+
+def test_plot_dir(games, tmp_path):
+	pytest.importorskip("matplotlib")
+
+	plots = tmp_path / "plots"
+	main(list(games) + ["-p", "1", "-o", str(tmp_path / "scores.csv"), "--plot-dir", str(plots)])
+
+	assert sorted(str(p.relative_to(plots)) for p in plots.rglob("*.png")) == [os.path.join("a", "game.png"), os.path.join("b", "game.png"), os.path.join("b", "log.png"), os.path.join("b", "store.png")]
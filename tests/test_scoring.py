@@ -0,0 +1,86 @@
+from MeritOrder import DispatchCache, MeritOrder, Power, clear_batch, pack_productions
+from SampleHistory import history as sample_history
+from Scoring import IncrementalScorer, calculate_final_scores, get_max_co2, get_max_price, get_prod_diffs, get_prod_sums, get_team_stats, prices, score_rounds
+from benchmark import generate_history
+
+import numpy as np
+import pytest
+
+SAMPLE_SCORES = {
+	"Team A": {"emx": 20.0, "fin": 92.91, "eco": 100.0, "pop": 82.58},
+	"Team B": {"emx": 30.0, "fin": 15.22, "eco": 17.59, "pop": 52.56},
+	"Team C": {"emx": 60.0, "fin": 67.3, "eco": 86.36, "pop": 82.73},
+	"Team D": {"emx": 10.0, "fin": 86.75, "eco": 83.79, "pop": 76.11},
+	"Team E": {"emx": 0.0, "fin": 97.08, "eco": 98.54, "pop": 79.12},
+}
+
+def test_sample_history_scores():
+	assert calculate_final_scores(sample_history) == SAMPLE_SCORES
+
+def test_team_helpers():
+	team_stats = get_team_stats(sample_history)
+	consumptions = [r["Team B"]["total_consumption"] for r in sample_history]
+	productions = get_prod_sums([r["Team B"]["productions"] for r in sample_history])
+
+	diffs, c, p = get_prod_diffs(team_stats, "Team B")
+
+	np.testing.assert_array_equal(p, productions)
+	np.testing.assert_array_equal(diffs, np.subtract(consumptions, productions))
+	assert get_max_co2(team_stats, "Team B") == sum(consumptions)
+	assert get_max_price(team_stats, "Team B") == prices[Power.GAS] * sum(consumptions)
+
+def test_first_plant_marginal():
+	#the first plant covers the consumption, only it is dispatched (the marginal plant used to read the supply before it at index -1)
+	merit_order = MeritOrder(prices, [(Power.NUCLEAR, 1000), (Power.GAS, 1000)], 500)
+
+	assert merit_order.getPrice() == 15
+	assert merit_order.getTotalExpenses() == 500 * 15
+	assert calculate_final_scores([{"A": {"productions": [(Power.NUCLEAR, 1000), (Power.GAS, 1000)], "total_consumption": 500}}])["A"]["fin"] == 88.64
+
+@pytest.mark.parametrize("seed", range(5))
+def test_score_rounds_matches_final_scores(seed):
+	history = generate_history(6, 12, 4, seed = seed)
+
+	assert score_rounds(history) == calculate_final_scores(history)
+
+def test_empty_portfolios():
+	#a round where no team built a plant clears a zero width batch
+	history = generate_history(6, 3, 4, seed = 0)
+	history.insert(1, {t: {"productions": [], "total_consumption": 500 + 100 * idx} for idx, t in enumerate(history[0])})
+
+	assert score_rounds(history) == calculate_final_scores(history)
+
+def test_rejected_round_leaves_scorer_unchanged():
+	history = generate_history(4, 3, 3, seed = 2)
+	scorer = IncrementalScorer()
+
+	with pytest.raises(KeyError):
+		scorer.add_round({"Team 0": {"productions": [("FOO", 1)], "total_consumption": 1}})
+
+	assert scorer.teams is None
+
+	for r in history:
+		scorer.add_round(r)
+
+	with pytest.raises(KeyError): #a team of the game is missing
+		scorer.add_round({"Team 0": history[0]["Team 0"]})
+
+	assert scorer.num_rounds == len(history)
+	assert scorer.get_scores() == calculate_final_scores(history)
+
+def test_dispatch_cache_matches_clear_batch():
+	history = generate_history(8, 10, 5, seed = 1)
+
+	codes, volumes = pack_productions([r[t]["productions"] for r in history for t in r])
+	consumptions = np.array([r[t]["total_consumption"] for r in history for t in r])
+
+	expected = clear_batch(prices, codes, volumes, consumptions)
+	cache = DispatchCache()
+
+	for _ in range(2): #cleared, then served from the cache
+		dispatch = cache.clear(prices, codes, volumes, consumptions)
+
+		for field in ["marginal", "codes", "dispatched", "price", "expenses", "co2", "stability"]:
+			np.testing.assert_array_equal(getattr(dispatch, field), getattr(expected, field))
+
+	assert cache.hits >= len(codes)
@@ -0,0 +1,112 @@
+from HistoryIO import encode_round
+from Scoring import calculate_final_scores
+from ScoringService import ScoringService
+from benchmark import generate_history
+
+import asyncio
+import json
+
+async def request(port, method, path, body = None, headers = None):
+	data = body if isinstance(body, bytes) else b"" if body is None else json.dumps(body).encode()
+	headers = {"Content-Length": len(data)} if headers is None else headers
+
+	reader, writer = await asyncio.open_connection("127.0.0.1", port)
+	writer.write(f"{method} {path} HTTP/1.1\r\n".encode() + "".join(f"{k}: {v}\r\n" for k, v in headers.items()).encode() + b"\r\n" + data)
+	await writer.drain()
+
+	response = await reader.read()
+	writer.close()
+
+	head, _, payload = response.partition(b"\r\n\r\n")
+
+	return int(head.split()[1]), json.loads(payload)
+
+async def next_event(reader):
+	while True:
+		line = await reader.readline()
+
+		if line.startswith(b"data: "):
+			return json.loads(line[6:])
+
+def get_expected(history):
+	return {t: {k: float(v) for k, v in s.items()} for t, s in calculate_final_scores(history).items()}
+
+def run(test):
+	async def main():
+		service = ScoringService(max_body = 1 << 20)
+		await service.start(port = 0)
+
+		try:
+			await test(service, service.get_port())
+
+		finally:
+			await service.close()
+
+	asyncio.run(main())
+
+def test_game():
+	history = generate_history(4, 5, 3, seed = 7)
+
+	async def test(service, port):
+		#subscribed before the first round
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		writer.write(b"GET /sessions/g/events HTTP/1.1\r\n\r\n")
+		await writer.drain()
+		await asyncio.sleep(0.05)
+
+		status, scores = await request(port, "POST", "/sessions/g/rounds", encode_round(history[0]))
+		assert status == 200 and scores["rounds"] == 1
+
+		event = await asyncio.wait_for(next_event(reader), 5)
+		assert event == scores
+
+		status, scores = await request(port, "POST", "/sessions/g/rounds", [encode_round(r) for r in history[1:]])
+		assert status == 200 and scores == {"rounds": len(history), "scores": get_expected(history)}
+
+		assert await request(port, "GET", "/sessions/g/scores") == (200, scores)
+
+		status, board = await request(port, "GET", "/sessions/g/leaderboard?factor=eco&k=2&team=Team%201")
+		best = sorted(scores["scores"].items(), key = lambda x: (-x[1]["eco"], x[0]))
+
+		assert status == 200
+		assert board["top"] == [{"team": t, "score": s["eco"]} for t, s in best[:2]]
+		assert board["rank"] == 1 + sum(s["eco"] > scores["scores"]["Team 1"]["eco"] for s in scores["scores"].values())
+
+		assert await request(port, "DELETE", "/sessions/g") == (200, {"deleted": True})
+		assert (await request(port, "GET", "/sessions/g/scores"))[0] == 404
+
+		writer.close()
+
+	run(test)
+
+def test_rejected_rounds():
+	history = generate_history(4, 3, 3, seed = 8)
+	missing = encode_round(history[2])
+	del missing["Team 0"]
+
+	async def test(service, port):
+		status, scores = await request(port, "POST", "/sessions/g/rounds", encode_round(history[0]))
+		assert status == 200
+
+		#the valid first round of the list is not added either
+		assert (await request(port, "POST", "/sessions/g/rounds", [encode_round(history[1]), missing]))[0] == 400
+		assert (await request(port, "POST", "/sessions/g/rounds", b"not json"))[0] == 400
+		assert (await request(port, "POST", "/sessions/g/rounds", ["not a round"]))[0] == 400
+		assert await request(port, "GET", "/sessions/g/scores") == (200, scores)
+
+		#a rejected first round does not create a session
+		assert (await request(port, "POST", "/sessions/new/rounds", [encode_round(history[0]), {"Team 0": {"productions": [["FOO", 1]], "total_consumption": 1}}]))[0] == 400
+		assert list(service.sessions) == ["g"]
+
+	run(test)
+
+def test_malformed_requests():
+	async def test(service, port):
+		assert (await request(port, "POST", "/sessions/g/rounds", headers = {"Content-Length": "abc"}))[0] == 400
+		assert (await request(port, "POST", "/sessions/g/rounds", headers = {"Content-Length": "-1"}))[0] == 400
+		assert (await request(port, "POST", "/sessions/g/rounds", headers = {"Content-Length": 1 << 30}))[0] == 413
+		assert (await request(port, "GET", "/elsewhere"))[0] == 404
+		assert (await request(port, "PUT", "/sessions/g/scores"))[0] == 405
+		assert service.sessions == dict()
+
+	run(test)
@@ -0,0 +1,80 @@
+from Scoring import calculate_final_scores
+from SharedSession import SharedGame
+from benchmark import generate_history
+
+import threading
+import pytest
+
+@pytest.fixture
+def game():
+	history = generate_history(5, 8, 3, seed = 4)
+	shared = SharedGame.create(list(history[0]), len(history))
+
+	yield shared, history
+
+	shared.close()
+	shared.unlink()
+
+def test_round_trip(game):
+	shared, history = game
+	attached = SharedGame.attach(shared.name)
+
+	try:
+		assert attached.teams == shared.teams
+		assert attached.get_scores() == dict()
+
+		for r in history:
+			shared.add_round(r)
+
+		assert attached.num_rounds == len(history)
+		assert attached.get_scores() == calculate_final_scores(history)
+
+		with pytest.raises(ValueError): #full
+			shared.add_round(history[0])
+
+	finally:
+		attached.close()
+
+def test_concurrent_reader(game):
+	shared, history = game
+	attached = SharedGame.attach(shared.name)
+
+	expected = [calculate_final_scores(history[:n]) if n else dict() for n in range(len(history) + 1)]
+	seen = []
+	done = threading.Event()
+
+	def read():
+		while not done.is_set():
+			seen.append(attached.read(lambda rounds: (rounds, attached.get_scores())))
+
+	reader = threading.Thread(target = read)
+	reader.start()
+
+	try:
+		for r in history:
+			shared.add_round(r)
+
+	finally:
+		done.set()
+		reader.join()
+		attached.close()
+
+	#every read saw the scores of a whole number of rounds
+	assert all(scores == expected[rounds] for rounds, scores in seen)
+
+def test_long_team_name():
+	with pytest.raises(ValueError):
+		SharedGame.create(["A", "x" * 65], 3)
+
+	with pytest.raises(ValueError): #64 characters, but 128 bytes in utf-8
+		SharedGame.create(["A", "ü" * 64], 3)
+
+	shared = SharedGame.create(["ü" * 32], 3)
+
+	try:
+		with SharedGame.attach(shared.name) as attached:
+			assert attached.teams == ["ü" * 32]
+
+	finally:
+		shared.close()
+		shared.unlink()
@@ -0,0 +1,70 @@
+from MeritOrder import Power
+from Storage import STORAGE, clear_with_storage, duration, efficiency, get_storage_power
+from TimeSeries import Profiles, clear_profiles
+
+import numpy as np
+import pytest
+
+def get_history(wind, availability):
+	return [{"A": {"productions": [(Power.WIND, wind), (Power.BATTERY, 50)], "total_consumption": 100, "load_profile": [100, 100], "availability": {Power.WIND: availability}}}]
+
+def generate_game(seed, rounds = 3, teams = 4, steps = 24):
+	rng = np.random.default_rng(seed)
+	#mostly renewables, so some steps have a surplus and some a shortfall
+	technologies = [Power.COAL, Power.GAS, Power.WIND, Power.WIND, Power.PHOTOVOLTAIC, Power.PHOTOVOLTAIC]
+
+	return [
+		{
+			f"T{t}": {
+				"productions": [(p, float(rng.integers(0, 4) * 100)) for p in technologies] + [(p, float(rng.integers(0, 3) * 50)) for p in STORAGE],
+				"total_consumption": 500,
+				"load_profile": 500 + 200 * rng.random(steps),
+				"availability": {Power.WIND: rng.random(steps), Power.PHOTOVOLTAIC: np.clip(np.sin(np.linspace(-np.pi / 2, 3 * np.pi / 2, steps)), 0, 1)},
+			}
+			for t in range(teams)
+		}
+		for _ in range(rounds)
+	]
+
+def test_no_charge_without_spare_supply():
+	#the wind only covers the demand of the first step, charging the battery there would leave it uncovered
+	dispatch, schedule = clear_with_storage(get_history(100, [1, 0]))
+
+	np.testing.assert_array_equal(schedule.charge, 0.0)
+	np.testing.assert_array_equal(dispatch.shortfall[0, 0], [0, 100])
+	assert dispatch.balance[0, 0] == 0.5
+
+def test_charge_capped_by_spare_supply():
+	dispatch, schedule = clear_with_storage(get_history(130, [1, 0.5]))
+
+	np.testing.assert_allclose(schedule.charge[0, 0, 1], [30, 0])
+	np.testing.assert_allclose(schedule.discharge[0, 0, 1], [0, 27])
+	np.testing.assert_allclose(dispatch.shortfall[0, 0], [0, 8])
+
+def test_no_discharge_without_shortfall():
+	#the second step is exactly covered, discharging there would oversupply it
+	history = [{"A": {"productions": [(Power.WIND, 200), (Power.GAS, 100), (Power.BATTERY, 25)], "total_consumption": 150, "load_profile": [150, 150], "availability": {Power.WIND: [1, 0.25]}}}]
+	dispatch, schedule = clear_with_storage(history)
+
+	np.testing.assert_array_equal(schedule.discharge, 0.0)
+	assert dispatch.balance[0, 0] == 0.5
+
+@pytest.mark.parametrize("seed", range(5))
+def test_storage_never_worse(seed):
+	history = generate_game(seed)
+	before = clear_profiles(history, profiles = Profiles.from_history(history).without(STORAGE))
+	after, schedule = clear_with_storage(history)
+
+	assert np.all(after.balance >= before.balance)
+	assert np.all(after.expenses <= before.expenses + 1e-9)
+	assert np.all(after.co2 <= before.co2 + 1e-9)
+	assert np.all(after.shortfall <= before.shortfall + 1e-9)
+
+	#only energy charged earlier in the round is discharged, and never more than fits
+	efficiencies = np.array([efficiency[p] for p in STORAGE])[:, np.newaxis]
+	stored = np.cumsum(schedule.charge - schedule.discharge / efficiencies, axis = -1)
+	capacity = get_storage_power(history) * [duration[p] for p in STORAGE]
+
+	assert np.all(stored >= -1e-9)
+	assert np.all(stored <= capacity[..., np.newaxis] + 1e-9)
+	assert schedule.discharge.sum() > 0
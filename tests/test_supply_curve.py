@@ -0,0 +1,67 @@
+from SupplyCurve import get_cache_path, load_units, parse_units
+
+import numpy as np
+import json
+import os
+import pytest
+
+def write_source(path, price):
+	with open(path, "w") as f:
+		json.dump({"gas": [{"price": str(price), "volume": "100"}], "coal": [{"price": "50"}]}, f)
+
+@pytest.fixture
+def source(tmp_path):
+	path = str(tmp_path / "plants.json")
+	write_source(path, 90)
+
+	return path
+
+def test_cache_is_mapped(source):
+	units = load_units(source)
+
+	assert os.path.exists(get_cache_path(source))
+
+	cached = load_units(source)
+
+	assert isinstance(cached, np.memmap)
+	assert cached["price"].tolist() == units["price"].tolist() == [90.0, 50.0]
+	assert cached["source"].tolist() == ["gas", "coal"]
+	assert np.isnan(cached["volume"][1])
+
+def test_cache_permissions(source):
+	umask = os.umask(0o022)
+
+	try:
+		load_units(source)
+
+	finally:
+		os.umask(umask)
+
+	assert os.stat(get_cache_path(source)).st_mode & 0o777 == 0o644
+
+def test_restored_source(source):
+	load_units(source)
+	stat = os.stat(source)
+
+	#a source restored with an older modification time than the cache is not served from it
+	write_source(source, 95)
+	os.utime(source, ns = (stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+
+	assert load_units(source)["price"].tolist() == [95.0, 50.0]
+	assert isinstance(load_units(source), np.memmap)
+
+def test_corrupt_cache(source):
+	load_units(source)
+
+	with open(get_cache_path(source), "r+b") as f:
+		f.write(b"garbage")
+
+	assert load_units(source)["price"].tolist() == [90.0, 50.0]
+	assert isinstance(load_units(source), np.memmap)
+
+def test_unwritable_cache(source):
+	#a directory in the way of the cache: the units are parsed every time and no temporary file is left behind
+	os.mkdir(get_cache_path(source))
+
+	assert load_units(source)["price"].tolist() == parse_units(source)["price"].tolist()
+	assert sorted(os.listdir(os.path.dirname(source))) == ["plants.json", "plants.json.npy"]
@@ -0,0 +1,46 @@
+import MeritOrder
+from MeritOrder import MeritOrder as Market, Power, get_table
+from Scoring import calculate_final_scores, combine_scores, ecology_score, finances_score, get_balance_matrix, get_team_stats, building_popularity, prices
+from Sweep import sweep
+from benchmark import generate_history
+
+import numpy as np
+
+PRICE_TABLES = [prices, {**prices, Power.GAS: 180, Power.COAL: 60}]
+CO2_TABLES = [MeritOrder.co2eq, {**MeritOrder.co2eq, Power.GAS: 0.3, Power.COAL: 1.4}]
+DERATING_TABLES = [MeritOrder.derating, {**MeritOrder.derating, Power.WIND: 20}]
+
+def test_default_tables():
+	history = generate_history(5, 6, 4, seed = 5)
+
+	assert sweep(history).get_scores() == calculate_final_scores(history)
+
+def test_matches_merit_orders():
+	history = generate_history(4, 5, 4, seed = 6)
+	result = sweep(history, PRICE_TABLES, CO2_TABLES, DERATING_TABLES)
+
+	assert result.shape == (2, 2, 2)
+
+	game = get_team_stats(history)
+	teams = list(history[0])
+	total_cons = game.consumptions.sum(axis = 0)
+	emx = get_balance_matrix(game.consumptions, game.get_production_sums(), len(history))[1] * 100
+
+	for p, price_table in enumerate(PRICE_TABLES):
+		#every market cleared on its own under the price table
+		markets = [[Market(price_table, r[t]["productions"], r[t]["total_consumption"]) for t in teams] for r in history]
+		units = [[m.getUnitDispatch() for m in row] for row in markets]
+		codes = [[m.sorted_productions["power"] for m in row] for row in markets]
+
+		expenses = np.array([[m.getTotalExpenses() for m in row] for row in markets]).sum(axis = 0)
+
+		for c, co2_table in enumerate(CO2_TABLES):
+			co2 = np.array([[u.dispatched @ get_table(co2_table)[k] for u, k in zip(row, krow)] for row, krow in zip(units, codes)]).sum(axis = 0)
+
+			expected = combine_scores(emx, finances_score(expenses, total_cons, price_table), ecology_score(co2, total_cons, co2_table), building_popularity(total_cons))
+
+			for d, derating_table in enumerate(DERATING_TABLES):
+				assert result.get_scores(p, c, d) == {t: {f: expected[f][idx] for f in expected} for idx, t in enumerate(teams)}
+
+				stability = [[u.dispatched @ get_table(derating_table)[k] / r[t]["total_consumption"] for u, k, t in zip(row, krow, teams)] for row, krow, r in zip(units, codes, history)]
+				np.testing.assert_allclose(result.stability[p, d], stability)
@@ -0,0 +1,78 @@
+from MeritOrder import MeritOrder, Power
+from Scoring import calculate_final_scores, prices
+from TimeSeries import Profiles, calculate_profile_scores, clear_profiles
+from benchmark import generate_history
+
+import numpy as np
+import pytest
+
+STEPS = 12
+
+def add_profiles(history, seed):
+	'''Give every round a load profile around its consumption and a wind and photovoltaic availability.'''
+
+	rng = np.random.default_rng(seed)
+
+	for round_dict in history:
+		for stats in round_dict.values():
+			stats["load_profile"] = (stats["total_consumption"] * rng.uniform(0.6, 1.4, STEPS)).tolist()
+			stats["availability"] = {Power.WIND: rng.uniform(0, 1, STEPS).tolist(), Power.PHOTOVOLTAIC: rng.uniform(0, 1, STEPS).tolist()}
+
+	return history
+
+def test_constant_profile():
+	history = generate_history(5, 6, 4, seed = 13)
+
+	profile_scores = calculate_profile_scores(history, profiles = Profiles.from_history(history, STEPS))
+	scores = calculate_final_scores(history)
+
+	assert list(profile_scores) == list(scores)
+
+	for team, s in scores.items():
+		assert profile_scores[team] == pytest.approx(s)
+
+def test_matches_merit_orders():
+	history = add_profiles(generate_history(3, 4, 6, seed = 14), seed = 15)
+	dispatch = clear_profiles(history, chunksize = 5)
+
+	teams = list(history[0])
+
+	for r, round_dict in enumerate(history):
+		for t, team in enumerate(teams):
+			stats = round_dict[team]
+			co2 = expenses = 0
+
+			for step in range(STEPS):
+				#every step cleared on its own with the available volumes
+				availability = {Power(p).value: a[step] for p, a in stats["availability"].items()}
+				productions = [(p, v * availability.get(Power(p).value, 1.0)) for p, v in stats["productions"]]
+
+				merit_order = MeritOrder(prices, productions, stats["load_profile"][step])
+				supply = sum(v for _, v in productions)
+
+				assert dispatch.price[r, t, step] == pytest.approx(merit_order.getPrice())
+				assert dispatch.shortfall[r, t, step] == pytest.approx(max(stats["load_profile"][step] - supply, 0))
+				assert dispatch.surplus[r, t, step] == pytest.approx(max(supply - stats["load_profile"][step], 0))
+
+				co2 += merit_order.getReleasedCO2()
+				expenses += merit_order.getTotalExpenses()
+
+			assert dispatch.co2[r, t] == pytest.approx(co2 / STEPS)
+			assert dispatch.expenses[r, t] == pytest.approx(expenses / STEPS)
+			assert dispatch.consumption[r, t] == pytest.approx(np.mean(stats["load_profile"]))
+
+def test_chunksize():
+	history = add_profiles(generate_history(3, 4, 6, seed = 16), seed = 17)
+
+	a = clear_profiles(history, chunksize = 1)
+	b = clear_profiles(history, chunksize = STEPS)
+
+	for field in ["price", "shortfall", "surplus", "free_surplus", "co2", "expenses", "consumption", "balance"]:
+		np.testing.assert_allclose(getattr(a, field), getattr(b, field))
+
+def test_mismatched_steps():
+	history = add_profiles(generate_history(2, 2, 3, seed = 18), seed = 19)
+	history[1][list(history[1])[0]]["load_profile"] = [1.0, 2.0]
+
+	with pytest.raises(ValueError):
+		Profiles.from_history(history)
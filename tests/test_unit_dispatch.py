@@ -0,0 +1,44 @@
+from MeritOrder import CO2EQ, MeritOrder, Power, get_table
+from Scoring import prices
+
+import numpy as np
+import pytest
+
+PRODUCTIONS = [(Power.GAS, 300), (Power.NUCLEAR, 500), (Power.COAL, 400), (Power.WIND, 200)]
+
+@pytest.mark.parametrize("consumption", [0, 150, 700, 1000, 1400, 2000])
+def test_matches_totals(consumption):
+	merit_order = MeritOrder(prices, PRODUCTIONS, consumption)
+	units = merit_order.getUnitDispatch()
+
+	codes = merit_order.sorted_productions["power"]
+	volumes = merit_order.sorted_productions["volume"]
+
+	assert units.price == merit_order.getPrice()
+	assert units.dispatched.sum() == pytest.approx(min(consumption, volumes.sum()))
+	assert units.cost.sum() == pytest.approx(merit_order.getTotalExpenses())
+	assert units.profit.sum() == pytest.approx(merit_order.getTotalProfit())
+	assert units.co2.sum() == pytest.approx(merit_order.getReleasedCO2())
+
+	np.testing.assert_allclose(units.revenue, units.dispatched * units.price)
+	np.testing.assert_allclose(units.cost, units.dispatched * get_table(prices)[codes])
+	np.testing.assert_allclose(units.co2, units.dispatched * CO2EQ[codes])
+
+	#every plant before the marginal one runs at its volume, none after it
+	assert np.all(units.dispatched[:units.marginal] == volumes[:units.marginal])
+	assert np.all(units.dispatched[units.marginal + 1:] == 0)
+
+def test_not_covered():
+	units = MeritOrder(prices, PRODUCTIONS, 5000).getUnitDispatch()
+
+	assert units.marginal == len(PRODUCTIONS)
+	assert units.price == 0
+
+def test_views_of_one_buffer():
+	merit_order = MeritOrder(prices, PRODUCTIONS, 1000)
+	units = merit_order.getUnitDispatch()
+
+	assert merit_order.getUnitDispatch() is units
+
+	for field in units.FIELDS:
+		assert getattr(units, field).base is units.buffer